@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import openpyxl
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src.utils.convert import xlsx_to_csv  # noqa: E402
+
+
+def build_workbook(path: Path, rows: int) -> None:
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("data")
+    ws.append(["id", "name", "region", "amount", "qty", "updated_at"])
+    base = datetime(2025, 1, 1)
+    for i in range(rows):
+        ws.append([i, f"store-{i}", f"region-{i % 37}", i * 1.25, i % 100, base + timedelta(minutes=i)])
+    wb.save(path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark xlsx_to_csv engines")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--source", help="Existing .xlsx file to convert instead of a generated one")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        source = Path(args.source) if args.source else tmp_dir / "bench.xlsx"
+        if not args.source:
+            start = time.perf_counter()
+            build_workbook(source, args.rows)
+            print(f"generated {args.rows} rows in {time.perf_counter() - start:.1f}s")
+
+        outputs = {}
+        for engine in ("openpyxl", "stream"):
+            output = tmp_dir / f"{engine}.csv"
+            start = time.perf_counter()
+            xlsx_to_csv(source, output, engine=engine)
+            elapsed = time.perf_counter() - start
+            with output.open("rb") as handle:
+                rows = sum(1 for _ in handle)
+            outputs[engine] = output.read_bytes()
+            print(f"{engine:>8}: {rows} rows in {elapsed:.2f}s ({rows / elapsed:,.0f} rows/sec)")
+
+        reference = outputs["openpyxl"]
+        for engine, payload in outputs.items():
+            print(f"{engine:>8}: identical={payload == reference}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 -- TODO: Replace placeholder logic with real business metrics.
-CREATE OR REPLACE TABLE mart.province AS
+-- materialized: table
 SELECT *
 FROM raw.chart_r29b8748abc9a44e88365b63
 WHERE run_date = DATE '{{ run_date }}';
\ No newline at end of file
@@ -8,8 +8,9 @@ from dotenv import load_dotenv
 from .config import load_config
 from .core import RunContext, setup_logging
 from .extract import run_extract
-from .storage import profile_raw_files, run_load
+from .storage import Warehouse, profile_raw_files, run_load
 from .transform import run_transform, run_compare
+from .transform.profile import format_transform_stats
 from .publish import run_publish
 from .pipeline import run_pipeline
 from .utils.dates import parse_date, yesterday
@@ -22,6 +23,10 @@ def build_parser() -> argparse.ArgumentParser:
 
     subparsers.add_parser("validate-config", help="Validate config file")
 
+    stats = subparsers.add_parser("transform-stats", help="Show slowest transform models and operators")
+    stats.add_argument("--runs", type=int, default=10, help="Number of recent profiled runs")
+    stats.add_argument("--limit", type=int, default=10)
+
     for name in ("run", "extract", "load", "transform", "publish", "profile", "compare", "backfill"):
         sub = subparsers.add_parser(name, help=f"{name} command")
         if name in {"run", "extract", "load", "transform", "publish", "profile", "compare"}:
@@ -48,6 +53,16 @@ def main() -> None:
         print(f"Config OK: {config.project.name}")
         return
 
+    if args.command == "transform-stats":
+        warehouse_path = Path(config.project.data_dir) / "warehouse.duckdb"
+        if not warehouse_path.exists():
+            raise SystemExit(f"Warehouse not found: {warehouse_path}")
+        warehouse = Warehouse(warehouse_path)
+        warehouse.init()
+        models, operators = warehouse.get_transform_stats(args.runs, args.limit)
+        print(format_transform_stats(models, operators))
+        return
+
     run_date = _resolve_run_date(getattr(args, "date", None), config.project.timezone)
     context = RunContext.create(run_date, Path(config.project.data_dir), Path(config.project.log_dir))
     logger = setup_logging(context.log_dir, context.run_id)
@@ -58,7 +73,18 @@ def main() -> None:
         return
 
     if args.command == "profile":
-        report_path = profile_raw_files(context, config.bi.charts, config.project.profile_sample_rows)
+        report_path = profile_raw_files(
+            context,
+            config.bi.charts,
+            config.project.profile_sample_rows,
+            prefer_xlsx=config.project.xlsx_load == "direct",
+            concurrency=config.project.profile_concurrency,
+            top_k=config.project.profile_top_k,
+            approx_threshold=config.project.profile_approx_distinct_rows,
+            warehouse=Warehouse(context.warehouse_path),
+            drift=config.project.profile_drift,
+            logger=logger,
+        )
         logger.info("Profile report written: %s", report_path)
         return
 
@@ -69,7 +95,14 @@ def main() -> None:
 
     if args.command == "transform":
         sql_dir = Path("sql/mart")
-        run_transform(context, sql_dir, logger)
+        run_transform(
+            context,
+            sql_dir,
+            logger,
+            concurrency=config.project.transform_concurrency,
+            use_cache=config.project.transform_cache,
+            profile=config.project.transform_profile,
+        )
         logger.info("Transform completed: %s", context.run_id)
         return
 
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import List, Optional, Literal
+from typing import Dict, List, Optional, Literal
 from pydantic import BaseModel, Field, field_validator, model_validator
 
 
@@ -19,6 +19,12 @@ def normalize_export_value(value: str) -> str:
     return normalized
 
 
+class ProfileDriftConfig(BaseModel):
+    window_days: int = Field(default=7, ge=1)
+    threshold: float = Field(default=0.5, gt=0)
+    null_rate_threshold: float = Field(default=0.1, gt=0)
+
+
 class ProjectConfig(BaseModel):
     name: str = "bi-pipeline"
     timezone: str = "Asia/Shanghai"
@@ -29,7 +35,36 @@ class ProjectConfig(BaseModel):
     request_max_retries: int = 5
     task_poll_interval_seconds: int = 5
     task_max_wait_seconds: int = 1800
+    task_poll_strategy: Literal["fixed", "adaptive"] = "fixed"
+    task_poll_initial_seconds: float = Field(default=0.5, gt=0)
+    task_poll_backoff: float = Field(default=2.0, ge=1)
+    task_poll_max_interval_seconds: float = Field(default=30.0, gt=0)
+    task_poll_jitter: float = Field(default=0.1, ge=0, lt=1)
+    task_poll_history_runs: int = Field(default=10, ge=1)
+    extract_concurrency: int = Field(default=1, ge=1)
+    extract_client: Literal["sync", "async"] = "sync"
+    extract_max_connections: int = Field(default=10, ge=1)
+    load_concurrency: int = Field(default=1, ge=1)
+    transform_concurrency: int = Field(default=1, ge=1)
+    transform_cache: bool = False
+    transform_profile: bool = False
+    publish_concurrency: int = Field(default=1, ge=1)
+    publish_qps: float = Field(default=20.0, ge=0)
+    publish_write_method: Literal["single", "batch"] = "batch"
+    publish_payload_bytes: int = Field(default=4 * 1024 * 1024, ge=1024)
+    publish_max_request_cells: int = Field(default=500000, ge=1)
+    publish_target_request_seconds: float = Field(default=10.0, gt=0)
+    xlsx_engine: Literal["auto", "stream", "openpyxl"] = "auto"
+    xlsx_load: Literal["csv", "direct"] = "csv"
+    xlsx_materialize_csv: bool = False
+    raw_format: Literal["csv", "parquet"] = "csv"
+    raw_keep_source: bool = True
     profile_sample_rows: int = 100000
+    profile_concurrency: int = Field(default=1, ge=1)
+    profile_top_k: int = Field(default=5, ge=1)
+    # Below profile_sample_rows, so full default samples take the HyperLogLog path.
+    profile_approx_distinct_rows: int = Field(default=10000, ge=0)
+    profile_drift: ProfileDriftConfig = Field(default_factory=ProfileDriftConfig)
 
     @field_validator("export_format", mode="before")
     @classmethod
@@ -50,6 +85,9 @@ class CompareConfig(BaseModel):
     baseline_dir: str = "baseline"
     rounding: int = 2
     max_samples: int = 20
+    keys: Dict[str, List[str]] = Field(default_factory=dict)
+    concurrency: int = Field(default=1, ge=1)
+    snapshot_cache: bool = True
 
 
 class FilterRules(BaseModel):
@@ -150,6 +188,11 @@ class OutputSheetConfig(BaseModel):
     batch_size: int = 5000
     clear_extra_rows: bool = True
     include_header: bool = True
+    publish_mode: Literal["full", "delta"] = "full"
+    batch_sizing: Literal["fixed", "auto"] = "fixed"
+    clear_method: Literal["blank", "delete_rows"] = "blank"
+    # delete_rows removes entire sheet rows, so it is only used when nothing else shares them.
+    owns_full_rows: bool = False
 
 
 class AlertConfig(BaseModel):
@@ -1,5 +1,6 @@
 from .guanbi import GuanbiClient
+from .guanbi_async import AsyncGuanbiClient
 from .filters import apply_filter_rules
 from .runner import run_extract, ExtractResult
 
-__all__ = ["GuanbiClient", "apply_filter_rules", "run_extract", "ExtractResult"]
+__all__ = ["GuanbiClient", "AsyncGuanbiClient", "apply_filter_rules", "run_extract", "ExtractResult"]
@@ -1,11 +1,13 @@
 from __future__ import annotations
 
+import threading
 import time
 from dataclasses import dataclass
-from typing import Dict, Tuple
+from typing import Callable, Dict, Optional, Tuple
 
 from ..config.model import BIConfig
 from ..utils.retry import create_retry_session
+from .polling import PollSchedule
 
 
 TYPE_OP = {
@@ -20,6 +22,54 @@ DOWNLOAD_PATH = {
     "pivot": "/api/export/file/excel/{task_filename}",
 }
 
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+def build_task_url(base_url: str, chart_id: str, mode: str, export_format: str) -> str:
+    if mode == "complex":
+        return f"{base_url}/api/complex-report/{chart_id}/generate"
+    type_op = TYPE_OP.get(export_format)
+    if not type_op:
+        raise ValueError(f"Unsupported export format: {export_format}")
+    return f"{base_url}/api/write/file/{chart_id}?typeOp={type_op}"
+
+
+def build_download_url(base_url: str, task_filename: str, mode: str, export_format: str) -> str:
+    if mode == "complex":
+        path = "/api/export/file/complexReport/{task_filename}"
+    else:
+        path = DOWNLOAD_PATH.get(export_format)
+        if not path:
+            raise ValueError(f"Unsupported export format: {export_format}")
+    return f"{base_url}{path.format(task_filename=task_filename)}"
+
+
+def parse_task_created(data: Dict) -> Tuple[str, str]:
+    task_id = data.get("taskId")
+    file_name = data.get("fileName")
+    if not task_id or not file_name:
+        raise RuntimeError(f"Unexpected task response: {data}")
+    return task_id, file_name
+
+
+def parse_task_status(task_id: str, data: Dict) -> Optional[str]:
+    status = data.get("status")
+    if status == "FINISHED":
+        finished = data.get("finishedTime")
+        if not finished:
+            raise RuntimeError(f"Missing finishedTime: {data}")
+        return finished
+    if status in {"FAILED", "CANCELLED"}:
+        raise RuntimeError(f"Task {task_id} failed: {data}")
+    return None
+
+
+def auth_headers(token: str) -> Dict[str, str]:
+    return {
+        "Content-Type": "application/json",
+        "Cookie": f"uIdToken={token}",
+        "token": token,
+    }
+
 
 @dataclass
 class GuanbiClient:
@@ -31,9 +81,21 @@ class GuanbiClient:
     poll_interval_seconds: int
     max_wait_seconds: int
     logger: any
+    pool_maxsize: int = 10
+    poll_schedule: Optional[PollSchedule] = None
 
     def __post_init__(self) -> None:
-        self.session = create_retry_session(self.max_retries)
+        self.session = create_retry_session(self.max_retries, pool_maxsize=self.pool_maxsize)
+        if self.poll_schedule is None:
+            self.poll_schedule = PollSchedule.fixed(self.poll_interval_seconds)
+        self._cancelled = threading.Event()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
 
     @property
     def base_url(self) -> str:
@@ -55,57 +117,56 @@ class GuanbiClient:
         return token
 
     def _headers(self, token: str) -> Dict[str, str]:
-        return {
-            "Content-Type": "application/json",
-            "Cookie": f"uIdToken={token}",
-            "token": token,
-        }
+        return auth_headers(token)
 
     def create_task(self, chart_id: str, token: str, filters: Dict, mode: str, export_format: str) -> Tuple[str, str]:
-        if mode == "complex":
-            url = f"{self.base_url}/api/complex-report/{chart_id}/generate"
-        else:
-            type_op = TYPE_OP.get(export_format)
-            if not type_op:
-                raise ValueError(f"Unsupported export format: {export_format}")
-            url = f"{self.base_url}/api/write/file/{chart_id}?typeOp={type_op}"
+        url = build_task_url(self.base_url, chart_id, mode, export_format)
         response = self.session.post(url, json=filters, headers=self._headers(token), timeout=self.timeout_seconds)
         response.raise_for_status()
-        data = response.json()
-        task_id = data.get("taskId")
-        file_name = data.get("fileName")
-        if not task_id or not file_name:
-            raise RuntimeError(f"Unexpected task response: {data}")
-        return task_id, file_name
+        return parse_task_created(response.json())
 
-    def poll_task(self, task_id: str, token: str) -> str:
+    def poll_task(
+        self,
+        task_id: str,
+        token: str,
+        expected_seconds: Optional[float] = None,
+        on_running: Optional[Callable[[], None]] = None,
+    ) -> str:
         url = f"{self.base_url}/api/task/{task_id}"
         start = time.time()
+        delays = self.poll_schedule.delays(expected_seconds)
         while True:
             response = self.session.get(url, headers=self._headers(token), timeout=self.timeout_seconds)
             response.raise_for_status()
-            data = response.json()
-            status = data.get("status")
-            if status == "FINISHED":
-                finished = data.get("finishedTime")
-                if not finished:
-                    raise RuntimeError(f"Missing finishedTime: {data}")
+            finished = parse_task_status(task_id, response.json())
+            if finished:
                 return finished
-            if status in {"FAILED", "CANCELLED"}:
-                raise RuntimeError(f"Task {task_id} failed: {data}")
+            if on_running is not None:
+                on_running()
             if time.time() - start > self.max_wait_seconds:
                 raise TimeoutError(f"Task {task_id} exceeded max wait {self.max_wait_seconds}s")
-            time.sleep(self.poll_interval_seconds)
-
-    def download(self, token: str, task_filename: str, finished_time: str, mode: str, export_format: str) -> bytes:
-        if mode == "complex":
-            path = "/api/export/file/complexReport/{task_filename}"
-        else:
-            path = DOWNLOAD_PATH.get(export_format)
-            if not path:
-                raise ValueError(f"Unsupported export format: {export_format}")
-        url = f"{self.base_url}{path.format(task_filename=task_filename)}"
+            if self._cancelled.wait(next(delays)):
+                raise RuntimeError(f"Task {task_id} polling cancelled")
+
+    def download_to(
+        self,
+        sink: Callable[[bytes], None],
+        token: str,
+        task_filename: str,
+        finished_time: str,
+        mode: str,
+        export_format: str,
+        chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+    ) -> None:
+        url = build_download_url(self.base_url, task_filename, mode, export_format)
         payload = {"time": finished_time, "fileNameWithTime": True}
-        response = self.session.post(url, json=payload, headers=self._headers(token), timeout=self.timeout_seconds)
-        response.raise_for_status()
-        return response.content
+        with self.session.post(
+            url,
+            json=payload,
+            headers=self._headers(token),
+            timeout=self.timeout_seconds,
+            stream=True,
+        ) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                sink(chunk)
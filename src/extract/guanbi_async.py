@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from ..config.model import BIConfig
+from ..utils.retry import RETRY_STATUSES
+from .guanbi import (
+    DOWNLOAD_CHUNK_SIZE,
+    auth_headers,
+    build_download_url,
+    build_task_url,
+    parse_task_created,
+    parse_task_status,
+)
+from .polling import PollSchedule
+
+
+def _require_aiohttp():
+    try:
+        import aiohttp
+    except ImportError as exc:
+        raise RuntimeError("aiohttp is required for project.extract_client = 'async'") from exc
+    return aiohttp
+
+
+@dataclass
+class _PendingTask:
+    token: str
+    future: asyncio.Future
+    deadline: float
+    delays: Iterator[float]
+    next_poll_at: float
+    on_running: Optional[Callable[[], None]] = None
+
+
+@dataclass
+class AsyncGuanbiClient:
+    config: BIConfig
+    username: str
+    password: str
+    timeout_seconds: int
+    max_retries: int
+    poll_interval_seconds: int
+    max_wait_seconds: int
+    logger: any
+    max_connections: int = 10
+    backoff_factor: float = 0.5
+    poll_schedule: Optional[PollSchedule] = None
+    _pending: Dict[str, _PendingTask] = field(default_factory=dict, init=False)
+
+    def __post_init__(self) -> None:
+        if self.poll_schedule is None:
+            self.poll_schedule = PollSchedule.fixed(self.poll_interval_seconds)
+
+    async def __aenter__(self) -> "AsyncGuanbiClient":
+        aiohttp = _require_aiohttp()
+        self._aiohttp = aiohttp
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_connections),
+            # timeout_seconds bounds connecting and each socket read, not a whole streamed download.
+            timeout=aiohttp.ClientTimeout(
+                total=None,
+                sock_connect=self.timeout_seconds,
+                sock_read=self.timeout_seconds,
+            ),
+        )
+        self._wakeup = asyncio.Event()
+        self._scheduler = asyncio.create_task(self._poll_loop())
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._scheduler.cancel()
+        try:
+            await self._scheduler
+        except asyncio.CancelledError:
+            pass
+        for pending in self._pending.values():
+            if not pending.future.done():
+                pending.future.cancel()
+        self._pending.clear()
+        await self.session.close()
+
+    @property
+    def base_url(self) -> str:
+        return self.config.base_url.rstrip("/")
+
+    async def _request(self, method: str, url: str, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                response = await self.session.request(method, url, **kwargs)
+            except (self._aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt >= self.max_retries:
+                    raise
+            else:
+                if response.status not in RETRY_STATUSES or attempt >= self.max_retries:
+                    response.raise_for_status()
+                    return response
+                response.release()
+            await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+            attempt += 1
+
+    async def _request_json(self, method: str, url: str, **kwargs) -> Dict:
+        response = await self._request(method, url, **kwargs)
+        async with response:
+            return await response.json(content_type=None)
+
+    async def sign_in(self) -> str:
+        url = f"{self.base_url}/api/user/sign-in"
+        payload = {
+            "domain": self.config.domain,
+            "loginId": self.username,
+            "password": self.password,
+        }
+        data = await self._request_json("POST", url, json=payload)
+        token = data.get("uIdToken")
+        if not token:
+            raise RuntimeError(f"Missing uIdToken in response: {data}")
+        return token
+
+    async def create_task(self, chart_id: str, token: str, filters: Dict, mode: str, export_format: str) -> Tuple[str, str]:
+        url = build_task_url(self.base_url, chart_id, mode, export_format)
+        data = await self._request_json("POST", url, json=filters, headers=auth_headers(token))
+        return parse_task_created(data)
+
+    async def poll_task(
+        self,
+        task_id: str,
+        token: str,
+        expected_seconds: Optional[float] = None,
+        on_running: Optional[Callable[[], None]] = None,
+    ) -> str:
+        # Tasks are only registered here; the single scheduler loop does the polling.
+        future = asyncio.get_running_loop().create_future()
+        now = time.monotonic()
+        self._pending[task_id] = _PendingTask(
+            token=token,
+            future=future,
+            deadline=now + self.max_wait_seconds,
+            delays=self.poll_schedule.delays(expected_seconds),
+            next_poll_at=now,
+            on_running=on_running,
+        )
+        self._wakeup.set()
+        try:
+            return await future
+        finally:
+            self._pending.pop(task_id, None)
+
+    async def _check_task(self, task_id: str, pending: _PendingTask) -> None:
+        if pending.future.done():
+            return
+        try:
+            url = f"{self.base_url}/api/task/{task_id}"
+            data = await self._request_json("GET", url, headers=auth_headers(pending.token))
+            finished = parse_task_status(task_id, data)
+            if finished:
+                pending.future.set_result(finished)
+                return
+            if pending.on_running is not None:
+                pending.on_running()
+            if time.monotonic() > pending.deadline:
+                raise TimeoutError(f"Task {task_id} exceeded max wait {self.max_wait_seconds}s")
+            pending.next_poll_at = time.monotonic() + next(pending.delays)
+        except Exception as exc:
+            if not pending.future.done():
+                pending.future.set_exception(exc)
+
+    async def _poll_loop(self) -> None:
+        while True:
+            self._wakeup.clear()
+            if not self._pending:
+                await self._wakeup.wait()
+                continue
+            now = time.monotonic()
+            next_due = min(pending.next_poll_at for pending in self._pending.values())
+            if next_due > now:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=next_due - now)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            # One round covers every task that is due; the connector caps open sockets.
+            due = [(task_id, pending) for task_id, pending in self._pending.items() if pending.next_poll_at <= now]
+            await asyncio.gather(*(self._check_task(task_id, pending) for task_id, pending in due))
+
+    async def download_to(
+        self,
+        sink: Callable[[bytes], None],
+        token: str,
+        task_filename: str,
+        finished_time: str,
+        mode: str,
+        export_format: str,
+        chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+    ) -> None:
+        url = build_download_url(self.base_url, task_filename, mode, export_format)
+        payload = {"time": finished_time, "fileNameWithTime": True}
+        response = await self._request("POST", url, json=payload, headers=auth_headers(token))
+        async with response:
+            async for chunk in response.content.iter_chunked(chunk_size):
+                sink(chunk)
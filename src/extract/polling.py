@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+from ..config.model import ProjectConfig
+
+
+@dataclass
+class PollSchedule:
+    initial_seconds: float
+    backoff: float = 1.0
+    max_interval_seconds: Optional[float] = None
+    jitter: float = 0.0
+    use_history: bool = False
+    expected_fraction: float = 0.9
+    rng: random.Random = field(default_factory=random.Random, repr=False)
+
+    @classmethod
+    def fixed(cls, interval_seconds: float) -> "PollSchedule":
+        return cls(initial_seconds=interval_seconds)
+
+    @classmethod
+    def from_config(cls, project: ProjectConfig) -> "PollSchedule":
+        if project.task_poll_strategy == "fixed":
+            return cls.fixed(project.task_poll_interval_seconds)
+        return cls(
+            initial_seconds=project.task_poll_initial_seconds,
+            backoff=project.task_poll_backoff,
+            max_interval_seconds=project.task_poll_max_interval_seconds,
+            jitter=project.task_poll_jitter,
+            use_history=True,
+        )
+
+    def _jittered(self, delay: float) -> float:
+        if not self.jitter:
+            return delay
+        return max(delay * self.rng.uniform(1 - self.jitter, 1 + self.jitter), 0.0)
+
+    # Sleeps between consecutive status checks; the first check is immediate.
+    def delays(self, expected_seconds: Optional[float] = None) -> Iterator[float]:
+        delay = self.initial_seconds
+        yield self._jittered(delay)
+        elapsed = delay
+        if self.use_history and expected_seconds:
+            # Skip the polls that history says cannot succeed and land just before
+            # the chart's typical completion time.
+            wait = expected_seconds * self.expected_fraction - elapsed
+            if wait > 0:
+                yield self._jittered(wait)
+        while True:
+            delay = delay * self.backoff
+            if self.max_interval_seconds is not None:
+                delay = min(delay, self.max_interval_seconds)
+            yield self._jittered(delay)
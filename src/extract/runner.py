@@ -1,16 +1,31 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 
 from ..config import get_env_or_fail
-from ..config.model import PipelineConfig, ChartConfig
+from ..config.model import PipelineConfig, ChartConfig, ProjectConfig
 from ..core.context import RunContext
 from ..extract.filters import apply_filter_rules
 from ..extract.guanbi import GuanbiClient
+from ..extract.guanbi_async import AsyncGuanbiClient
+from ..extract.polling import PollSchedule
 from ..utils.convert import xlsx_to_csv
-from ..storage import ManifestWriter, save_raw_bytes, count_csv_rows, build_export_record
+from ..storage import (
+    ManifestWriter,
+    RawFile,
+    RawFileWriter,
+    Warehouse,
+    count_csv_rows,
+    build_export_record,
+    remove_stale_raw_files,
+    write_raw_parquet,
+)
+from ..storage.warehouse import ExcelReaderUnavailable
 from ..utils.fs import ensure_dir
 
 
@@ -54,13 +69,299 @@ def _build_attempts(chart: ChartConfig, default_format: str) -> List[Tuple[str,
     return unique
 
 
-def run_extract(config: PipelineConfig, context: RunContext, logger) -> ExtractResult:
+@dataclass
+class ChartExport:
+    data_path: Path
+    row_count: Optional[int]
+    record: Dict
+    export_mode: str = ""
+    export_format: str = ""
+    task_seconds: Optional[float] = None
+
+
+@dataclass
+class _TaskTimer:
+    # The task finished somewhere between the last poll that saw it running and the
+    # first that saw it finished. The midpoint is recorded; the observed finish would
+    # include the whole poll gap and keep adaptive estimates from ever shrinking.
+    created: float = field(default_factory=time.monotonic)
+    last_running: Optional[float] = None
+
+    def running(self) -> None:
+        self.last_running = time.monotonic()
+
+    def seconds(self) -> float:
+        finished = time.monotonic()
+        return ((self.last_running or self.created) + finished) / 2 - self.created
+
+
+def _raw_extension(mode: str, export_format: str) -> str:
+    return ".csv" if export_format == "csv" and mode == "simple" else ".xlsx"
+
+
+def _finalize_export(
+    chart: ChartConfig,
+    raw_file: RawFile,
+    filters: Dict,
+    mode: str,
+    export_format: str,
+    project: ProjectConfig,
+    logger,
+) -> ChartExport:
+    file_path = raw_file.path
+    csv_path: Optional[Path]
+    if file_path.suffix == ".csv":
+        csv_path = file_path
+        data_path = file_path
+        row_count = raw_file.csv_row_count
+    elif project.xlsx_load == "direct":
+        # The loader reads the XLSX itself; the CSV copy is only kept for auditing.
+        data_path = file_path
+        csv_path = None
+        row_count = None
+        if project.xlsx_materialize_csv:
+            csv_path = file_path.with_suffix(".csv")
+            xlsx_to_csv(file_path, csv_path, chart.sheet_name, engine=project.xlsx_engine)
+            row_count = count_csv_rows(csv_path)
+    else:
+        csv_path = file_path.with_suffix(".csv")
+        data_path = csv_path
+        xlsx_to_csv(file_path, csv_path, chart.sheet_name, engine=project.xlsx_engine)
+        row_count = count_csv_rows(csv_path)
+    remove_stale_raw_files(file_path, keep=tuple(p for p in (file_path, csv_path) if p))
+
+    parquet_path: Optional[Path] = None
+    if project.raw_format == "parquet":
+        parquet_path, parquet_rows = _write_parquet(chart, data_path, project, logger)
+        if row_count is None:
+            row_count = parquet_rows
+        if not project.raw_keep_source:
+            for path in {file_path, csv_path} - {None}:
+                path.unlink(missing_ok=True)
+        data_path = parquet_path
+
+    record = build_export_record(
+        chart,
+        file_path,
+        csv_path,
+        filters,
+        row_count,
+        export_format,
+        mode,
+        file_size=raw_file.file_size,
+        sha256=raw_file.sha256,
+    )
+    if parquet_path:
+        record["parquet_path"] = str(parquet_path)
+    logger.info("Saved export for %s to %s (loads from %s)", chart.chart_id, file_path, data_path)
+    return ChartExport(
+        data_path=data_path,
+        row_count=row_count,
+        record=record,
+        export_mode=mode,
+        export_format=export_format,
+    )
+
+
+def _write_parquet(chart: ChartConfig, data_path: Path, project: ProjectConfig, logger) -> Tuple[Path, int]:
+    try:
+        return write_raw_parquet(data_path, chart.sheet_name)
+    except ExcelReaderUnavailable as exc:
+        csv_path = data_path.with_suffix(".csv")
+        logger.warning("Direct XLSX read failed for %s (%s); writing parquet via %s", chart.chart_id, exc, csv_path)
+        if not csv_path.exists():
+            xlsx_to_csv(data_path, csv_path, chart.sheet_name, engine=project.xlsx_engine)
+        return write_raw_parquet(csv_path)
+
+
+def _prepare_chart(chart: ChartConfig, config: PipelineConfig, context: RunContext) -> Tuple[Dict, List[Tuple[str, str]]]:
+    filters = apply_filter_rules(chart.filters, chart.filter_rules, context.run_date)
+    attempts = _build_attempts(chart, config.project.export_format)
+    if not attempts:
+        raise ValueError(f"No export attempts configured for chart {chart.chart_id}")
+    return filters, attempts
+
+
+def _log_attempt_failure(logger, chart: ChartConfig, mode: str, export_format: str, exc: Exception) -> None:
+    logger.warning(
+        "Export attempt failed for %s (%s/%s): %s",
+        chart.chart_id,
+        mode,
+        export_format,
+        exc,
+    )
+
+
+def _extract_chart(
+    client: GuanbiClient,
+    token: str,
+    chart: ChartConfig,
+    config: PipelineConfig,
+    context: RunContext,
+    logger,
+    estimates: Dict[Tuple[str, str, str], float],
+) -> ChartExport:
+    filters, attempts = _prepare_chart(chart, config, context)
+
+    last_error: Exception | None = None
+    for mode, export_format in attempts:
+        if client.cancelled:
+            raise RuntimeError(f"Extract cancelled before chart {chart.chart_id} completed")
+        try:
+            task_id, file_name = client.create_task(chart.chart_id, token, filters, mode, export_format)
+            logger.info("Created task %s for chart %s (%s/%s)", task_id, chart.chart_id, mode, export_format)
+
+            timer = _TaskTimer()
+            expected = estimates.get((chart.chart_id, mode, export_format))
+            finished_time = client.poll_task(task_id, token, expected, timer.running)
+            task_seconds = timer.seconds()
+            logger.info("Task %s finished after about %.1fs", task_id, task_seconds)
+
+            extension = _raw_extension(mode, export_format)
+            with RawFileWriter(context, chart, extension, count_lines=extension == ".csv") as writer:
+                client.download_to(writer.write, token, file_name, finished_time, mode, export_format)
+                raw_file = writer.commit()
+            export = _finalize_export(chart, raw_file, filters, mode, export_format, config.project, logger)
+            export.task_seconds = task_seconds
+            return export
+        except Exception as exc:
+            last_error = exc
+            _log_attempt_failure(logger, chart, mode, export_format, exc)
+            continue
+
+    raise last_error
+
+
+async def _extract_chart_async(
+    client: AsyncGuanbiClient,
+    token: str,
+    chart: ChartConfig,
+    config: PipelineConfig,
+    context: RunContext,
+    logger,
+    limiter: asyncio.Semaphore,
+    estimates: Dict[Tuple[str, str, str], float],
+) -> ChartExport:
+    filters, attempts = _prepare_chart(chart, config, context)
+
+    async with limiter:
+        last_error: Exception | None = None
+        for mode, export_format in attempts:
+            try:
+                task_id, file_name = await client.create_task(chart.chart_id, token, filters, mode, export_format)
+                logger.info("Created task %s for chart %s (%s/%s)", task_id, chart.chart_id, mode, export_format)
+
+                timer = _TaskTimer()
+                expected = estimates.get((chart.chart_id, mode, export_format))
+                finished_time = await client.poll_task(task_id, token, expected, timer.running)
+                task_seconds = timer.seconds()
+                logger.info("Task %s finished after about %.1fs", task_id, task_seconds)
+
+                extension = _raw_extension(mode, export_format)
+                with RawFileWriter(context, chart, extension, count_lines=extension == ".csv") as writer:
+                    await client.download_to(writer.write, token, file_name, finished_time, mode, export_format)
+                    raw_file = writer.commit()
+                export = await asyncio.to_thread(
+                    _finalize_export, chart, raw_file, filters, mode, export_format, config.project, logger
+                )
+                export.task_seconds = task_seconds
+                return export
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                last_error = exc
+                _log_attempt_failure(logger, chart, mode, export_format, exc)
+                continue
+
+    raise last_error
+
+
+async def _run_extract_async(
+    config: PipelineConfig,
+    context: RunContext,
+    logger,
+    username: str,
+    password: str,
+    concurrency: int,
+    estimates: Dict[Tuple[str, str, str], float],
+    on_export: Callable[[ChartConfig, ChartExport], None],
+) -> None:
+    client = AsyncGuanbiClient(
+        config=config.bi,
+        username=username,
+        password=password,
+        timeout_seconds=config.project.request_timeout_seconds,
+        max_retries=config.project.request_max_retries,
+        poll_interval_seconds=config.project.task_poll_interval_seconds,
+        max_wait_seconds=config.project.task_max_wait_seconds,
+        logger=logger,
+        max_connections=config.project.extract_max_connections,
+        poll_schedule=PollSchedule.from_config(config.project),
+    )
+    async with client:
+        token = await client.sign_in()
+        logger.info("Signed in to Guanbi")
+
+        limiter = asyncio.Semaphore(concurrency)
+        tasks = [
+            asyncio.create_task(_extract_chart_async(client, token, chart, config, context, logger, limiter, estimates))
+            for chart in config.bi.charts
+        ]
+        try:
+            for chart, task in zip(config.bi.charts, tasks):
+                on_export(chart, await task)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def run_extract(
+    config: PipelineConfig,
+    context: RunContext,
+    logger,
+    warehouse: Optional[Warehouse] = None,
+) -> ExtractResult:
     ensure_dir(context.raw_dir)
     manifest = ManifestWriter(context)
 
     username = get_env_or_fail(config.bi.username_env)
     password = get_env_or_fail(config.bi.password_env)
 
+    # Only adaptive polling reads and writes task history; a fixed-interval extract
+    # never touches the warehouse.
+    adaptive = config.project.task_poll_strategy == "adaptive"
+    estimates: Dict[Tuple[str, str, str], float] = {}
+    if adaptive:
+        warehouse = warehouse or Warehouse(context.warehouse_path)
+        warehouse.init()
+        estimates = warehouse.get_task_duration_estimates(config.project.task_poll_history_runs)
+
+    files: Dict[str, Path] = {}
+    row_counts: Dict[str, int | None] = {}
+
+    def _record(chart: ChartConfig, export: ChartExport) -> None:
+        manifest.add_export(export.record)
+        files[chart.chart_id] = export.data_path
+        row_counts[chart.chart_id] = export.row_count
+        if adaptive and export.task_seconds is not None:
+            warehouse.record_task_duration(
+                context.run_id,
+                chart.chart_id,
+                export.export_mode,
+                export.export_format,
+                export.task_seconds,
+            )
+
+    if config.project.extract_client == "async":
+        concurrency = max(config.project.extract_concurrency, 1)
+        logger.info("Extracting %s charts with async client (concurrency %s)", len(config.bi.charts), concurrency)
+        asyncio.run(
+            _run_extract_async(config, context, logger, username, password, concurrency, estimates, _record)
+        )
+        return ExtractResult(files=files, row_counts=row_counts)
+
+    concurrency = min(config.project.extract_concurrency, max(len(config.bi.charts), 1))
     client = GuanbiClient(
         config=config.bi,
         username=username,
@@ -70,60 +371,34 @@ def run_extract(config: PipelineConfig, context: RunContext, logger) -> ExtractR
         poll_interval_seconds=config.project.task_poll_interval_seconds,
         max_wait_seconds=config.project.task_max_wait_seconds,
         logger=logger,
+        pool_maxsize=max(concurrency, 10),
+        poll_schedule=PollSchedule.from_config(config.project),
     )
 
     token = client.sign_in()
     logger.info("Signed in to Guanbi")
 
-    files: Dict[str, Path] = {}
-    row_counts: Dict[str, int | None] = {}
-
-    for chart in config.bi.charts:
-        filters = apply_filter_rules(chart.filters, chart.filter_rules, context.run_date)
-        attempts = _build_attempts(chart, config.project.export_format)
-        if not attempts:
-            raise ValueError(f"No export attempts configured for chart {chart.chart_id}")
+    if concurrency <= 1:
+        for chart in config.bi.charts:
+            _record(chart, _extract_chart(client, token, chart, config, context, logger, estimates))
+        return ExtractResult(files=files, row_counts=row_counts)
 
-        last_error: Exception | None = None
-        for mode, export_format in attempts:
+    logger.info("Extracting %s charts with concurrency %s", len(config.bi.charts), concurrency)
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="extract") as executor:
+        futures = [
+            executor.submit(_extract_chart, client, token, chart, config, context, logger, estimates)
+            for chart in config.bi.charts
+        ]
+        # Collect in config order so the manifest matches a sequential run and the
+        # first failing chart (in config order) is the one that gets raised.
+        for chart, future in zip(config.bi.charts, futures):
             try:
-                task_id, file_name = client.create_task(chart.chart_id, token, filters, mode, export_format)
-                logger.info("Created task %s for chart %s (%s/%s)", task_id, chart.chart_id, mode, export_format)
-
-                finished_time = client.poll_task(task_id, token)
-                logger.info("Task %s finished", task_id)
-
-                content = client.download(token, file_name, finished_time, mode, export_format)
-                extension = ".csv" if export_format == "csv" and mode == "simple" else ".xlsx"
-                file_path = save_raw_bytes(context, chart, content, extension)
-
-                if extension == ".csv":
-                    csv_path = file_path
-                else:
-                    csv_path = file_path.with_suffix(".csv")
-                    xlsx_to_csv(file_path, csv_path, chart.sheet_name)
-
-                row_count = count_csv_rows(csv_path)
-                record = build_export_record(chart, file_path, csv_path, filters, row_count, export_format, mode)
-                manifest.add_export(record)
-
-                files[chart.chart_id] = csv_path
-                row_counts[chart.chart_id] = row_count
-                logger.info("Saved export for %s to %s (csv %s)", chart.chart_id, file_path, csv_path)
-                last_error = None
-                break
-            except Exception as exc:
-                last_error = exc
-                logger.warning(
-                    "Export attempt failed for %s (%s/%s): %s",
-                    chart.chart_id,
-                    mode,
-                    export_format,
-                    exc,
-                )
-                continue
-
-        if last_error is not None:
-            raise last_error
+                export = future.result()
+            except Exception:
+                for pending in futures:
+                    pending.cancel()
+                client.cancel()
+                raise
+            _record(chart, export)
 
     return ExtractResult(files=files, row_counts=row_counts)
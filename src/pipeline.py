@@ -21,6 +21,19 @@ class PipelineResult:
 
 def run_pipeline(config: PipelineConfig, context: RunContext, logger) -> PipelineResult:
     warehouse = Warehouse(context.warehouse_path)
+    with warehouse.session():
+        return _run_stages(config, context, logger, warehouse)
+
+
+def _record_run_end(warehouse: Warehouse, run_id: str, status: str, error: Optional[str], metrics: Dict) -> None:
+    # Checkpoint before reading the counters so the recorded stats include the stage
+    # writes; the session's closing checkpoint then only flushes this row.
+    warehouse.checkpoint()
+    metrics["warehouse"] = warehouse.stats()
+    warehouse.record_run_end(run_id, status, error, metrics)
+
+
+def _run_stages(config: PipelineConfig, context: RunContext, logger, warehouse: Warehouse) -> PipelineResult:
     warehouse.init()
     run_date = context.run_date.strftime("%Y-%m-%d")
     warehouse.record_run_start(context.run_id, run_date)
@@ -28,14 +41,14 @@ def run_pipeline(config: PipelineConfig, context: RunContext, logger) -> Pipelin
     metrics: Dict[str, dict] = {}
     try:
         start = time.time()
-        extract_result = run_extract(config, context, logger)
+        extract_result = run_extract(config, context, logger, warehouse)
         metrics["extract"] = {
             "seconds": time.time() - start,
             "row_counts": extract_result.row_counts,
         }
 
         start = time.time()
-        load_result = run_load(config, context, logger)
+        load_result = run_load(config, context, logger, warehouse)
         metrics["load"] = {
             "seconds": time.time() - start,
             "raw_rows": load_result.raw_rows,
@@ -43,24 +56,35 @@ def run_pipeline(config: PipelineConfig, context: RunContext, logger) -> Pipelin
         }
 
         start = time.time()
-        transform_result = run_transform(context, Path("sql/mart"), logger)
+        transform_result = run_transform(
+            context,
+            Path("sql/mart"),
+            logger,
+            warehouse,
+            concurrency=config.project.transform_concurrency,
+            use_cache=config.project.transform_cache,
+            profile=config.project.transform_profile,
+        )
         metrics["transform"] = {
             "seconds": time.time() - start,
             "table_rows": transform_result.table_rows,
+            "cached": transform_result.cached,
         }
 
         start = time.time()
-        publish_result = run_publish(config, context, logger)
+        publish_result = run_publish(config, context, logger, warehouse)
         metrics["publish"] = {
             "seconds": time.time() - start,
             "sheet_rows": publish_result.sheet_rows,
+            "written_rows": publish_result.written_rows,
+            "requests": publish_result.requests,
         }
 
-        warehouse.record_run_end(context.run_id, "success", None, metrics)
+        _record_run_end(warehouse, context.run_id, "success", None, metrics)
         logger.info("Pipeline completed: %s", context.run_id)
         return PipelineResult(metrics=metrics)
     except Exception as exc:
-        warehouse.record_run_end(context.run_id, "failed", str(exc), metrics)
+        _record_run_end(warehouse, context.run_id, "failed", str(exc), metrics)
         if config.feishu.alert:
             try:
                 client = FeishuClient(
@@ -1,4 +1,4 @@
-from .feishu import FeishuClient
+from .feishu import FeishuClient, FeishuPayloadTooLarge
 from .runner import run_publish, PublishResult
 
-__all__ = ["FeishuClient", "run_publish", "PublishResult"]
\ No newline at end of file
+__all__ = ["FeishuClient", "FeishuPayloadTooLarge", "run_publish", "PublishResult"]
\ No newline at end of file
@@ -1,13 +1,23 @@
 from __future__ import annotations
 
+import json
+import threading
 import time
 from dataclasses import dataclass
 from datetime import date, datetime
-from typing import Dict, List, Optional
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional
 
 import requests
 
-from ..utils.retry import create_retry_session
+from ..utils.ratelimit import TokenBucket
+from ..utils.retry import RETRY_STATUSES, create_retry_session
+
+
+# Feishu reports throttling either as HTTP 429 or as one of these codes in the body.
+RATE_LIMIT_CODES = {99991400, 90217}
+MAX_BACKOFF_SECONDS = 30.0
+STREAM_CHUNK_BYTES = 64 * 1024
 
 
 def col_num_to_letter(n: int) -> str:
@@ -31,6 +41,8 @@ def serialize_value(value):
         return value.isoformat(sep=" ", timespec="seconds")
     if isinstance(value, date):
         return value.strftime("%Y-%m-%d")
+    if isinstance(value, Decimal):
+        return float(value)
     return value
 
 
@@ -38,6 +50,75 @@ def serialize_values(values: List[List]) -> List[List]:
     return [[serialize_value(cell) for cell in row] for row in values]
 
 
+def encode_row(values: List) -> bytes:
+    return json.dumps(serialize_values([values])[0], ensure_ascii=False, allow_nan=False).encode("utf-8")
+
+
+class FeishuPayloadTooLarge(RuntimeError):
+    pass
+
+
+def _is_payload_rejection(status_code: int, data: Optional[Dict]) -> bool:
+    # HTTP 413 from the gateway; the sheets API reports oversized writes with an error
+    # message rather than a dedicated code.
+    if status_code == 413:
+        return True
+    if status_code == 429 or (data or {}).get("code") in RATE_LIMIT_CODES:
+        return False
+    message = str((data or {}).get("msg") or "").lower()
+    return any(marker in message for marker in ("too large", "too long", "exceed"))
+
+
+@dataclass
+class ValueRange:
+    # rows are UTF-8 JSON arrays (see encode_row and the publish row SQL). The range is
+    # serialized on the fly while a request body is sent, never as one bytes object.
+    range_str: str
+    rows: List[bytes]
+
+    def __post_init__(self) -> None:
+        self._head = ('{"range":' + json.dumps(self.range_str) + ',"values":[').encode("utf-8")
+        self.nbytes = len(self._head) + sum(len(row) for row in self.rows) + max(len(self.rows) - 1, 0) + 2
+
+    def chunks(self, chunk_bytes: int = STREAM_CHUNK_BYTES) -> Iterator[bytes]:
+        yield self._head
+        buffer: List[bytes] = []
+        size = 0
+        for index, row in enumerate(self.rows):
+            if index:
+                buffer.append(b",")
+            buffer.append(row)
+            size += len(row) + 1
+            if size >= chunk_bytes:
+                yield b"".join(buffer)
+                buffer = []
+                size = 0
+        buffer.append(b"]}")
+        yield b"".join(buffer)
+
+
+@dataclass
+class JsonStream:
+    # Request body for one or more value ranges. It has a length, so requests sends it
+    # with Content-Length in chunk_bytes pieces, and every iteration starts over, so
+    # retries resend the same payload.
+    prefix: bytes
+    ranges: List[ValueRange]
+    suffix: bytes
+    chunk_bytes: int = STREAM_CHUNK_BYTES
+
+    def __len__(self) -> int:
+        return len(self.prefix) + sum(r.nbytes for r in self.ranges) + max(len(self.ranges) - 1, 0) + len(self.suffix)
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield self.prefix
+        for index, value_range in enumerate(self.ranges):
+            if index:
+                yield b","
+            yield from value_range.chunks(self.chunk_bytes)
+        yield self.suffix
+
+
 @dataclass
 class FeishuClient:
     app_id: str
@@ -45,13 +126,26 @@ class FeishuClient:
     timeout_seconds: int
     max_retries: int
     logger: any
+    pool_maxsize: int = 10
+    rate_limiter: Optional[TokenBucket] = None
 
     def __post_init__(self) -> None:
-        self.session = create_retry_session(self.max_retries)
+        # 429s are handled in _request so the backoff is shared through rate_limiter.
+        self.session = create_retry_session(
+            self.max_retries,
+            pool_maxsize=self.pool_maxsize,
+            statuses=tuple(status for status in RETRY_STATUSES if status != 429),
+        )
         self._token: Optional[str] = None
         self._token_expiry: float = 0.0
+        self._token_lock = threading.Lock()
+        self._local = threading.local()
 
     def _get_token(self) -> str:
+        with self._token_lock:
+            return self._fetch_token()
+
+    def _fetch_token(self) -> str:
         now = time.time()
         if self._token and now < self._token_expiry:
             return self._token
@@ -73,13 +167,55 @@ class FeishuClient:
         token = self._get_token()
         return {"Authorization": f"Bearer {token}", "Content-Type": "application/json; charset=utf-8"}
 
+    def _backoff_seconds(self, response: requests.Response, attempt: int) -> float:
+        for header in ("x-ogw-ratelimit-reset", "Retry-After"):
+            value = response.headers.get(header)
+            if value:
+                try:
+                    return min(max(float(value), 0.0), MAX_BACKOFF_SECONDS)
+                except ValueError:
+                    pass
+        return min(0.5 * 2**attempt, MAX_BACKOFF_SECONDS)
+
+    def _request(self, method: str, url: str, action: str, **kwargs) -> Dict:
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            response = self.session.request(
+                method, url, headers=self._auth_headers(), timeout=self.timeout_seconds, **kwargs
+            )
+            self._local.elapsed = response.elapsed.total_seconds()
+            try:
+                data = response.json()
+            except ValueError:
+                data = None
+            code = data.get("code") if isinstance(data, dict) else None
+            if (response.status_code == 429 or code in RATE_LIMIT_CODES) and attempt < self.max_retries:
+                delay = self._backoff_seconds(response, attempt)
+                self.logger.warning("Feishu rate limited %s (code %s), retrying in %.1fs", action, code, delay)
+                if self.rate_limiter is not None:
+                    self.rate_limiter.pause(delay)
+                else:
+                    time.sleep(delay)
+                attempt += 1
+                continue
+            if (response.status_code >= 400 or code != 0) and _is_payload_rejection(
+                response.status_code, data if isinstance(data, dict) else None
+            ):
+                raise FeishuPayloadTooLarge(f"Failed to {action}, payload rejected: {data}")
+            response.raise_for_status()
+            if code != 0:
+                raise RuntimeError(f"Failed to {action}: {data}")
+            return data
+
+    def last_request_seconds(self) -> float:
+        # Server time of this thread's last HTTP call, without rate-limit waits or backoff.
+        return getattr(self._local, "elapsed", 0.0)
+
     def list_sheets(self, spreadsheet_token: str) -> List[Dict]:
         url = f"https://open.feishu.cn/open-apis/sheets/v3/spreadsheets/{spreadsheet_token}/sheets/query"
-        response = self.session.get(url, headers=self._auth_headers(), timeout=self.timeout_seconds)
-        response.raise_for_status()
-        data = response.json()
-        if data.get("code") != 0:
-            raise RuntimeError(f"Failed to list sheets: {data}")
+        data = self._request("GET", url, "list sheets")
         return data.get("data", {}).get("sheets", [])
 
     def get_sheet_id(self, spreadsheet_token: str, sheet_name: str) -> str:
@@ -92,12 +228,30 @@ class FeishuClient:
     def write_values(self, spreadsheet_token: str, range_str: str, values: List[List]) -> Dict:
         url = f"https://open.feishu.cn/open-apis/sheets/v2/spreadsheets/{spreadsheet_token}/values"
         payload = {"valueRange": {"range": range_str, "values": serialize_values(values)}}
-        response = self.session.put(url, headers=self._auth_headers(), json=payload, timeout=self.timeout_seconds)
-        response.raise_for_status()
-        data = response.json()
-        if data.get("code") != 0:
-            raise RuntimeError(f"Failed to write values: {data}")
-        return data
+        return self._request("PUT", url, "write values", json=payload)
+
+    def write_value_range(self, spreadsheet_token: str, value_range: ValueRange) -> Dict:
+        url = f"https://open.feishu.cn/open-apis/sheets/v2/spreadsheets/{spreadsheet_token}/values"
+        body = JsonStream(b'{"valueRange":', [value_range], b"}")
+        return self._request("PUT", url, "write values", data=body)
+
+    def write_values_batch(self, spreadsheet_token: str, value_ranges: List[ValueRange]) -> Dict:
+        url = f"https://open.feishu.cn/open-apis/sheets/v2/spreadsheets/{spreadsheet_token}/values_batch_update"
+        body = JsonStream(b'{"valueRanges":[', value_ranges, b"]}")
+        return self._request("POST", url, "batch write values", data=body)
+
+    def delete_rows(self, spreadsheet_token: str, sheet_id: str, start_index: int, end_index: int) -> Dict:
+        # 1-based, inclusive row numbers.
+        url = f"https://open.feishu.cn/open-apis/sheets/v2/spreadsheets/{spreadsheet_token}/dimension_range"
+        payload = {
+            "dimension": {
+                "sheetId": sheet_id,
+                "majorDimension": "ROWS",
+                "startIndex": start_index,
+                "endIndex": end_index,
+            }
+        }
+        return self._request("DELETE", url, "delete rows", json=payload)
 
     def send_alert(self, receive_id_type: str, receive_id: str, content: str) -> None:
         url = f"https://open.feishu.cn/open-apis/im/v1/messages?receive_id_type={receive_id_type}"
@@ -106,8 +260,4 @@ class FeishuClient:
             "msg_type": "text",
             "content": {"text": content},
         }
-        response = self.session.post(url, headers=self._auth_headers(), json=payload, timeout=self.timeout_seconds)
-        response.raise_for_status()
-        data = response.json()
-        if data.get("code") != 0:
-            raise RuntimeError(f"Failed to send alert: {data}")
+        self._request("POST", url, "send alert", json=payload)
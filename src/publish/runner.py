@@ -1,19 +1,27 @@
 from __future__ import annotations
 
 import re
-from dataclasses import dataclass
-from typing import Dict, Iterable, List, Tuple
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
 import duckdb
+import requests
 
 from ..config import get_env_or_fail
 from ..config.model import PipelineConfig, OutputSheetConfig
 from ..core.context import RunContext
-from ..publish.feishu import FeishuClient, get_excel_range
+from ..publish.feishu import FeishuClient, FeishuPayloadTooLarge, ValueRange, encode_row, get_excel_range
+from ..publish.sizing import BatchSizer
 from ..storage import Warehouse
+from ..storage.warehouse import quote_ident
+from ..utils.ratelimit import TokenBucket
 
 
 CELL_RE = re.compile(r"^([A-Za-z]+)(\d+)$")
+# Feishu accepts at most 5000 rows per written range.
+MAX_RANGE_ROWS = 5000
 
 
 def parse_cell(cell: str) -> Tuple[int, int]:
@@ -27,109 +35,440 @@ def parse_cell(cell: str) -> Tuple[int, int]:
     return col, int(row)
 
 
-def _fetch_batches(cursor: duckdb.DuckDBPyConnection, batch_size: int) -> Iterable[List[List]]:
+@dataclass
+class PublishResult:
+    sheet_rows: Dict[str, int]
+    written_rows: Dict[str, int] = field(default_factory=dict)
+    requests: Dict[str, int] = field(default_factory=dict)
+
+
+def _row_json_sql(column_types: List[Tuple[str, str]]) -> str:
+    # Cells are formatted and JSON-encoded column-wise in DuckDB, in the same format
+    # serialize_value produces, so rows reach Python as ready-made UTF-8 JSON arrays.
+    cells = []
+    for name, column_type in column_types:
+        column = quote_ident(name)
+        column_type = column_type.upper()
+        if column_type == "DATE":
+            cells.append(f"strftime({column}, '%Y-%m-%d')")
+        elif column_type == "TIMESTAMP WITH TIME ZONE":
+            # %z prints whole-hour offsets as +08; isoformat() writes +08:00.
+            cells.append(
+                f"regexp_replace(strftime({column}, '%Y-%m-%d %H:%M:%S%z'), '([+-][0-9]{{2}})$', '\\1:00')"
+            )
+        elif column_type.startswith("TIMESTAMP"):
+            cells.append(f"strftime({column}, '%Y-%m-%d %H:%M:%S')")
+        elif column_type in ("DOUBLE", "FLOAT"):
+            # NaN and infinities are not valid JSON; they are published as blank cells.
+            cells.append(f"CASE WHEN isfinite({column}) THEN {column} END")
+        else:
+            cells.append(column)
+    return f"encode(json_array({', '.join(cells)})::VARCHAR)"
+
+
+def _changed_runs(
+    cursor: duckdb.DuckDBPyConnection,
+    batch_size: int,
+    previous: Optional[List[int]],
+    hashes: List[int],
+) -> Iterable[Tuple[int, List[bytes]]]:
+    # Rows come back as (row_hash, row_json). Yields (row_index, rows) for each run of
+    # consecutive rows that differ from the previous snapshot, split at batch_size;
+    # without a snapshot every row is a change. All hashes are appended to `hashes`.
+    run_start = 0
+    run: List[bytes] = []
+    index = 0
     while True:
         rows = cursor.fetchmany(batch_size)
         if not rows:
             break
-        yield [list(row) for row in rows]
+        for row in rows:
+            row_hash = row[0]
+            hashes.append(row_hash)
+            if previous is None or index >= len(previous) or previous[index] != row_hash:
+                if not run:
+                    run_start = index
+                run.append(row[1])
+                if len(run) >= batch_size:
+                    yield run_start, run
+                    run = []
+            elif run:
+                yield run_start, run
+                run = []
+            index += 1
+    if run:
+        yield run_start, run
 
 
 @dataclass
-class PublishResult:
-    sheet_rows: Dict[str, int]
+class _Writes:
+    # Runs writes inline, or on a shared pool with at most max_in_flight outstanding
+    # for the sheet that owns this instance.
+    pool: Optional[ThreadPoolExecutor] = None
+    max_in_flight: int = 1
+    futures: List[Future] = field(default_factory=list)
+
+    def submit(self, fn: Callable, *args) -> None:
+        if self.pool is None:
+            fn(*args)
+            return
+        self.futures.append(self.pool.submit(fn, *args))
+        self._drain(self.max_in_flight)
+
+    def join(self) -> None:
+        self._drain(0)
+
+    def cancel(self) -> None:
+        for future in self.futures:
+            future.cancel()
+        wait(self.futures)
+        self.futures = []
+
+    def _drain(self, keep: int) -> None:
+        while len(self.futures) > keep:
+            done, _ = wait(self.futures, return_when=FIRST_COMPLETED)
+            self.futures = [future for future in self.futures if future not in done]
+            for future in done:
+                future.result()
+
+
+def _split_rows(rows: List[bytes], budget_bytes: int) -> Iterable[Tuple[int, List[bytes]]]:
+    start = 0
+    size = 0
+    for index, row in enumerate(rows):
+        if index > start and size + len(row) > budget_bytes:
+            yield start, rows[start:index]
+            start = index
+            size = 0
+        size += len(row) + 1
+    yield start, rows[start:]
+
+
+def _halve(value_range: ValueRange) -> List[ValueRange]:
+    sheet_id, cells = value_range.range_str.rsplit("!", 1)
+    start_cell, end_cell = cells.split(":")
+    start_col, start_row = parse_cell(start_cell)
+    end_col, _ = parse_cell(end_cell)
+    cols = end_col - start_col + 1
+    middle = len(value_range.rows) // 2
+    return [
+        ValueRange(f"{sheet_id}!{get_excel_range(start_row, start_col, middle, cols)}", value_range.rows[:middle]),
+        ValueRange(
+            f"{sheet_id}!{get_excel_range(start_row + middle, start_col, len(value_range.rows) - middle, cols)}",
+            value_range.rows[middle:],
+        ),
+    ]
+
+
+@dataclass
+class _RangeWriter:
+    # Packs a sheet's ranges into values_batch_update requests of at most payload_bytes
+    # and max_cells (a larger single range is sent on its own); method "single" keeps one
+    # PUT per range. With a sizer the byte budget is learned, ranges above it are split,
+    # and requests rejected as too large are retried in halves.
+    client: FeishuClient
+    spreadsheet_token: str
+    writes: _Writes
+    method: str = "batch"
+    payload_bytes: int = 4 * 1024 * 1024
+    max_cells: int = 500000
+    sizer: Optional[BatchSizer] = None
+    requests: int = 0
+    max_range_rows: int = 0
+    _pending: List[ValueRange] = field(default_factory=list)
+    _pending_bytes: int = 0
+    _pending_cells: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def write(self, sheet_id: str, start_row: int, start_col: int, rows: List[bytes], cols: int) -> None:
+        if not rows:
+            return
+        value_range = ValueRange(f"{sheet_id}!{get_excel_range(start_row, start_col, len(rows), cols)}", rows)
+        if self.sizer is not None and len(rows) > 1 and value_range.nbytes > self.sizer.target_bytes:
+            for offset, piece in _split_rows(rows, self.sizer.target_bytes):
+                self.write(sheet_id, start_row + offset, start_col, piece, cols)
+            return
+        self.max_range_rows = max(self.max_range_rows, len(rows))
+        if self.method == "single":
+            self.writes.submit(self._send, [value_range])
+            return
+        budget = self.sizer.target_bytes if self.sizer is not None else self.payload_bytes
+        cells = len(rows) * cols
+        if self._pending and (
+            self._pending_bytes + value_range.nbytes > budget or self._pending_cells + cells > self.max_cells
+        ):
+            self.flush()
+        self._pending.append(value_range)
+        self._pending_bytes += value_range.nbytes + 1
+        self._pending_cells += cells
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        self.writes.submit(self._send, self._pending)
+        self._pending = []
+        self._pending_bytes = 0
+        self._pending_cells = 0
 
+    def _send(self, ranges: List[ValueRange]) -> None:
+        with self._lock:
+            self.requests += 1
+        nbytes = sum(value_range.nbytes for value_range in ranges)
+        try:
+            if self.method == "single":
+                self.client.write_value_range(self.spreadsheet_token, ranges[0])
+            else:
+                self.client.write_values_batch(self.spreadsheet_token, ranges)
+        except FeishuPayloadTooLarge:
+            if self.sizer is None or (len(ranges) == 1 and len(ranges[0].rows) == 1) or not self.sizer.reject(nbytes):
+                raise
+            if len(ranges) > 1:
+                parts = [ranges[: len(ranges) // 2], ranges[len(ranges) // 2 :]]
+            else:
+                parts = [[half] for half in _halve(ranges[0])]
+            for part in parts:
+                self._send(part)
+            return
+        if self.sizer is not None:
+            self.sizer.observe(nbytes, self.client.last_request_seconds())
 
-def _write_batch(client: FeishuClient, spreadsheet_token: str, sheet_id: str, start_row: int, start_col: int, values: List[List]) -> None:
-    if not values:
-        return
-    rows = len(values)
-    cols = len(values[0]) if values[0] else 0
-    range_str = f"{sheet_id}!{get_excel_range(start_row, start_col, rows, cols)}"
-    client.write_values(spreadsheet_token, range_str, values)
+    def barrier(self) -> None:
+        # Everything written so far lands before anything written afterwards. Requests
+        # only complete out of order on a pool; inline, one request keeps range order.
+        if self.writes.pool is not None:
+            self.flush()
+            self.writes.join()
 
+    def join(self) -> None:
+        self.flush()
+        self.writes.join()
 
-def _clear_tail(client: FeishuClient, spreadsheet_token: str, sheet_id: str, start_row: int, start_col: int, rows: int, cols: int, batch_size: int) -> None:
+
+def _clear_tail(writer: _RangeWriter, sheet_id: str, start_row: int, start_col: int, rows: int, cols: int, batch_size: int) -> None:
     remaining = rows
     current_row = start_row
-    blank_row = ["" for _ in range(cols)]
+    blank_row = encode_row(["" for _ in range(cols)])
     while remaining > 0:
         take = min(batch_size, remaining)
-        values = [blank_row for _ in range(take)]
-        range_str = f"{sheet_id}!{get_excel_range(current_row, start_col, take, cols)}"
-        client.write_values(spreadsheet_token, range_str, values)
+        writer.write(sheet_id, current_row, start_col, [blank_row] * take, cols)
         current_row += take
         remaining -= take
 
 
-def run_publish(config: PipelineConfig, context: RunContext, logger) -> PublishResult:
+def _delete_tail(
+    client: FeishuClient, spreadsheet_token: str, sheet_id: str, start_row: int, rows: int, logger
+) -> Tuple[int, int]:
+    # Deletes bottom-up so row numbers above each chunk stay valid. Returns the number of
+    # calls made and how many rows (from start_row) are left if a delete fails.
+    end_row = start_row + rows - 1
+    calls = 0
+    while end_row >= start_row:
+        first_row = max(start_row, end_row - MAX_RANGE_ROWS + 1)
+        calls += 1
+        try:
+            client.delete_rows(spreadsheet_token, sheet_id, first_row, end_row)
+        except (RuntimeError, requests.RequestException) as exc:
+            logger.warning("Failed to delete rows %s-%s of %s: %s", first_row, end_row, sheet_id, exc)
+            return calls, end_row - start_row + 1
+        end_row = first_row - 1
+    return calls, 0
+
+
+def _publish_output(
+    client: FeishuClient,
+    config: PipelineConfig,
+    context: RunContext,
+    warehouse: Warehouse,
+    output: OutputSheetConfig,
+    sheet_id: str,
+    writes: _Writes,
+    logger,
+) -> Tuple[int, int, int]:
+    project = config.project
+    sizer: Optional[BatchSizer] = None
+    if output.batch_sizing == "auto":
+        # Each run starts from the budget the previous run ended with.
+        sizer = BatchSizer(
+            target_bytes=warehouse.get_last_batch_bytes(output.sheet_name) or project.publish_payload_bytes,
+            max_bytes=project.publish_payload_bytes,
+            target_seconds=project.publish_target_request_seconds,
+        )
+    writer = _RangeWriter(
+        client,
+        config.feishu.spreadsheet_token,
+        writes,
+        project.publish_write_method,
+        project.publish_payload_bytes,
+        project.publish_max_request_cells,
+        sizer,
+    )
+    start_col, start_row = parse_cell(output.start_cell)
+    prev_publish = warehouse.get_last_publish(output.sheet_name)
+    snapshot = warehouse.get_publish_snapshot(output.sheet_name)
+
+    try:
+        with warehouse.connect() as con:
+            column_types = [(row[0], row[1]) for row in con.execute(f"DESCRIBE {output.table}").fetchall()]
+            columns = [name for name, _ in column_types]
+            batch_rows = output.batch_size
+            if sizer is not None:
+                batch_rows = min(MAX_RANGE_ROWS, max(project.publish_max_request_cells // max(len(columns), 1), 1))
+            # Row hashes are only needed to keep a snapshot for delta publishes.
+            delta = output.publish_mode == "delta"
+            row_hash_sql = "hash(*COLUMNS(*))" if delta else "NULL"
+            cursor = con.execute(
+                f"SELECT {row_hash_sql} AS __row_hash, {_row_json_sql(column_types)} AS __row_json FROM {output.table}"
+            )
+
+            # Delta writes are only safe against a snapshot of the same layout; anything
+            # else (first publish, moved start cell or first data row, changed header) is
+            # a full rewrite.
+            previous: Optional[List[int]] = None
+            if delta and snapshot is not None:
+                snap_start_cell, snap_include_header, snap_columns, snap_hashes = snapshot
+                if (
+                    snap_start_cell == output.start_cell
+                    and snap_include_header == output.include_header
+                    and snap_columns == columns
+                ):
+                    previous = snap_hashes
+            # A publish that fails halfway, or a full publish, leaves the sheet out of step
+            # with the snapshot, so any snapshot is invalidated up front.
+            if delta or (snapshot is not None and snapshot[2]):
+                warehouse.record_publish_snapshot(output.sheet_name, output.start_cell, output.include_header, [], [])
+
+            data_row = start_row
+            written = 0
+            if output.include_header:
+                if previous is None:
+                    writer.write(sheet_id, start_row, start_col, [encode_row(columns)], len(columns))
+                    writer.barrier()
+                    written += 1
+                data_row += 1
+
+            hashes: List[int] = []
+            for offset, batch in _changed_runs(cursor, batch_rows, previous, hashes):
+                writer.write(sheet_id, data_row + offset, start_col, batch, len(columns))
+                written += len(batch)
+
+        total_rows = len(hashes) + (1 if output.include_header else 0)
+        # The tail is only cleared once every data batch has landed.
+        if output.clear_extra_rows and prev_publish:
+            prev_rows, prev_cols = prev_publish
+            extra_rows = max(prev_rows - total_rows, 0)
+            if extra_rows > 0 and output.clear_method == "delete_rows":
+                if start_col != 1 or not output.owns_full_rows:
+                    # Deleting whole rows would also remove whatever sits beside the table.
+                    logger.warning(
+                        "Not deleting rows of %s (needs owns_full_rows and a start in column A), clearing with blanks",
+                        output.sheet_name,
+                    )
+                else:
+                    writer.join()
+                    delete_calls, remaining = _delete_tail(
+                        client, config.feishu.spreadsheet_token, sheet_id, start_row + total_rows, extra_rows, logger
+                    )
+                    writer.requests += delete_calls
+                    if remaining:
+                        logger.warning("Clearing %s undeleted rows of %s with blanks", remaining, output.sheet_name)
+                    else:
+                        logger.info("Deleted %s extra rows for %s", extra_rows, output.sheet_name)
+                    extra_rows = remaining
+            if extra_rows > 0:
+                writer.barrier()
+                _clear_tail(writer, sheet_id, start_row + total_rows, start_col, extra_rows, prev_cols, batch_rows)
+                logger.info("Cleared %s extra rows for %s", extra_rows, output.sheet_name)
+        writer.join()
+    except BaseException:
+        writes.cancel()
+        raise
+
+    warehouse.record_publish(
+        context.run_id,
+        context.run_date.strftime("%Y-%m-%d"),
+        output.sheet_name,
+        total_rows,
+        len(columns),
+        request_count=writer.requests,
+        batch_rows=writer.max_range_rows,
+        batch_bytes=sizer.target_bytes if sizer is not None else None,
+    )
+    if delta:
+        warehouse.record_publish_snapshot(output.sheet_name, output.start_cell, output.include_header, columns, hashes)
+    logger.info(
+        "Published %s rows to %s (%s rows written in %s requests)", total_rows, output.sheet_name, written, writer.requests
+    )
+    return total_rows, written, writer.requests
+
+
+def run_publish(
+    config: PipelineConfig,
+    context: RunContext,
+    logger,
+    warehouse: Optional[Warehouse] = None,
+) -> PublishResult:
     app_id = get_env_or_fail(config.feishu.app_id_env)
     app_secret = get_env_or_fail(config.feishu.app_secret_env)
+    concurrency = config.project.publish_concurrency
+    qps = config.project.publish_qps
     client = FeishuClient(
         app_id=app_id,
         app_secret=app_secret,
         timeout_seconds=config.project.request_timeout_seconds,
         max_retries=config.project.request_max_retries,
         logger=logger,
+        pool_maxsize=max(concurrency, 10),
+        rate_limiter=TokenBucket(qps, capacity=max(qps, 1.0)) if qps > 0 else None,
     )
 
-    warehouse = Warehouse(context.warehouse_path)
-    warehouse.init()
+    warehouse = warehouse or Warehouse(context.warehouse_path)
+    outputs = config.feishu.outputs
+    results: Dict[str, Tuple[int, int, int]] = {}
 
-    sheets = client.list_sheets(config.feishu.spreadsheet_token)
-    sheet_cache: Dict[str, str] = {s.get("title"): s.get("sheet_id") for s in sheets}
+    with warehouse.session():
+        warehouse.init()
 
-    sheet_rows: Dict[str, int] = {}
-
-    with duckdb.connect(str(context.warehouse_path)) as con:
-        for output in config.feishu.outputs:
-            table = output.table
-            sheet_id = sheet_cache.get(output.sheet_name)
-            if not sheet_id:
+        sheets = client.list_sheets(config.feishu.spreadsheet_token)
+        sheet_cache: Dict[str, str] = {s.get("title"): s.get("sheet_id") for s in sheets}
+        for output in outputs:
+            if not sheet_cache.get(output.sheet_name):
                 raise ValueError(f"Sheet not found: {output.sheet_name}")
-            start_col, start_row = parse_cell(output.start_cell)
-
-            prev_publish = warehouse.get_last_publish(output.sheet_name)
-            cursor = con.execute(f"SELECT * FROM {table}")
-            columns = [desc[0] for desc in cursor.description]
 
-            current_row = start_row
-            total_rows = 0
-            if output.include_header:
-                _write_batch(client, config.feishu.spreadsheet_token, sheet_id, current_row, start_col, [columns])
-                current_row += 1
-                total_rows += 1
-
-            for batch in _fetch_batches(cursor, output.batch_size):
-                _write_batch(client, config.feishu.spreadsheet_token, sheet_id, current_row, start_col, batch)
-                current_row += len(batch)
-                total_rows += len(batch)
-
-            sheet_rows[output.sheet_name] = total_rows
-            if output.clear_extra_rows and prev_publish:
-                prev_rows, prev_cols = prev_publish
-                extra_rows = max(prev_rows - total_rows, 0)
-                if extra_rows > 0:
-                    _clear_tail(
+        if concurrency <= 1:
+            for output in outputs:
+                results[output.sheet_name] = _publish_output(
+                    client, config, context, warehouse, output, sheet_cache[output.sheet_name], _Writes(), logger
+                )
+        else:
+            logger.info("Publishing %s sheets with concurrency %s", len(outputs), concurrency)
+            with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="publish") as write_pool, ThreadPoolExecutor(
+                max_workers=min(concurrency, max(len(outputs), 1)), thread_name_prefix="publish-sheet"
+            ) as sheet_pool:
+                futures = [
+                    sheet_pool.submit(
+                        _publish_output,
                         client,
-                        config.feishu.spreadsheet_token,
-                        sheet_id,
-                        start_row + total_rows,
-                        start_col,
-                        extra_rows,
-                        prev_cols,
-                        output.batch_size,
+                        config,
+                        context,
+                        warehouse,
+                        output,
+                        sheet_cache[output.sheet_name],
+                        _Writes(write_pool, concurrency),
+                        logger,
                     )
-                    logger.info("Cleared %s extra rows for %s", extra_rows, output.sheet_name)
-
-            warehouse.record_publish(
-                context.run_id,
-                context.run_date.strftime("%Y-%m-%d"),
-                output.sheet_name,
-                total_rows,
-                len(columns),
-            )
-
-            logger.info("Published %s rows to %s", total_rows, output.sheet_name)
+                    for output in outputs
+                ]
+                # Collected in config order, so the first failing sheet (in config order) is raised.
+                for output, future in zip(outputs, futures):
+                    try:
+                        results[output.sheet_name] = future.result()
+                    except Exception:
+                        for pending in futures:
+                            pending.cancel()
+                        raise
 
-    return PublishResult(sheet_rows=sheet_rows)
+    return PublishResult(
+        sheet_rows={name: rows for name, (rows, _, _) in results.items()},
+        written_rows={name: written for name, (_, written, _) in results.items()},
+        requests={name: count for name, (_, _, count) in results.items()},
+    )
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+
+
+@dataclass
+class BatchSizer:
+    # Byte budget per publish request. It shrinks when a request is rejected as too large
+    # or runs slower than target_seconds, and grows back toward max_bytes when requests
+    # that used most of the budget come back fast.
+    target_bytes: int
+    max_bytes: int
+    target_seconds: float
+    min_bytes: int = 64 * 1024
+    growth: float = 1.5
+    _lock: threading.Lock = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.target_bytes = max(self.min_bytes, min(self.target_bytes, self.max_bytes))
+        self._lock = threading.Lock()
+
+    def observe(self, nbytes: int, seconds: float) -> None:
+        with self._lock:
+            if seconds > self.target_seconds:
+                scaled = int(nbytes * self.target_seconds / seconds)
+                self.target_bytes = max(self.min_bytes, min(self.target_bytes, scaled))
+            elif nbytes >= self.target_bytes * 0.8 and seconds < self.target_seconds / 2:
+                self.target_bytes = min(self.max_bytes, int(self.target_bytes * self.growth))
+
+    def reject(self, nbytes: int) -> bool:
+        # Returns False once the rejected request was already at the minimum size.
+        with self._lock:
+            if nbytes <= self.min_bytes:
+                return False
+            self.target_bytes = max(self.min_bytes, min(self.target_bytes, nbytes // 2))
+            return True
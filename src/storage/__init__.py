@@ -1,14 +1,26 @@
 from .manifest import ManifestWriter
-from .raw import save_raw_bytes, count_csv_rows, build_export_record
+from .raw import (
+    RawFile,
+    RawFileWriter,
+    count_csv_rows,
+    build_export_record,
+    resolve_raw_path,
+    remove_stale_raw_files,
+    write_raw_parquet,
+)
 from .profile import profile_raw_files
 from .warehouse import Warehouse
 from .loader import run_load, LoadResult
 
 __all__ = [
     "ManifestWriter",
-    "save_raw_bytes",
+    "RawFile",
+    "RawFileWriter",
     "count_csv_rows",
     "build_export_record",
+    "resolve_raw_path",
+    "remove_stale_raw_files",
+    "write_raw_parquet",
     "profile_raw_files",
     "Warehouse",
     "run_load",
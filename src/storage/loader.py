@@ -1,35 +1,47 @@
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor, wait
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict
+from typing import Callable, Dict, Optional, TypeVar
 
-from ..config.model import PipelineConfig, TargetTableConfig
+from ..config.model import ChartConfig, PipelineConfig, ProjectConfig, TargetTableConfig
 from ..core.context import RunContext
-from .warehouse import Warehouse
+from .raw import resolve_raw_path, write_raw_parquet
+from .warehouse import XLSX_SUFFIXES, ExcelReaderUnavailable, Warehouse
 from ..utils.convert import xlsx_to_csv
 from ..utils.fs import ensure_dir
 
 
+T = TypeVar("T")
+
+
 @dataclass
 class LoadResult:
     raw_rows: Dict[str, int]
     target_rows: Dict[str, int]
 
 
+def _target_cache_path(target: TargetTableConfig, context: RunContext) -> Path:
+    cache_dir = ensure_dir(context.data_dir / "targets_cache")
+    return cache_dir / f"{target.name}.csv"
+
+
 def _resolve_target_paths(
     target: TargetTableConfig,
     context: RunContext,
     logger,
+    project: ProjectConfig,
 ) -> tuple[Path, Path]:
     if not target.path:
         raise ValueError("Target path is required")
     source_path = Path(target.path)
     suffix = source_path.suffix.lower()
-    if suffix in {".xlsx", ".xlsm"}:
-        cache_dir = ensure_dir(context.data_dir / "targets_cache")
-        output_path = cache_dir / f"{target.name}.csv"
-        xlsx_to_csv(source_path, output_path, target.sheet_name)
+    if suffix in XLSX_SUFFIXES:
+        if project.xlsx_load == "direct":
+            return source_path, source_path
+        output_path = _target_cache_path(target, context)
+        xlsx_to_csv(source_path, output_path, target.sheet_name, engine=project.xlsx_engine)
         logger.info("Converted target %s from %s to %s", target.name, source_path, output_path)
         return source_path, output_path
     if suffix == ".xls":
@@ -37,23 +49,132 @@ def _resolve_target_paths(
     return source_path, source_path
 
 
-def run_load(config: PipelineConfig, context: RunContext, logger) -> LoadResult:
-    warehouse = Warehouse(context.warehouse_path)
+def _resolve_raw_source(context: RunContext, chart: ChartConfig, project: ProjectConfig, logger) -> Path:
+    raw_path = resolve_raw_path(context, chart, prefer_xlsx=project.xlsx_load == "direct")
+    if not raw_path.exists():
+        raise FileNotFoundError(f"Missing raw file for chart {chart.chart_id}: {raw_path}")
+    if project.raw_format == "parquet" and raw_path.suffix == ".csv":
+        # Partitions extracted before the parquet switch are converted on first load.
+        raw_path, _ = write_raw_parquet(raw_path)
+        logger.info("Converted raw CSV for %s to %s", chart.chart_id, raw_path)
+    return raw_path
+
+
+def _load_raw(
+    load: Callable[[ChartConfig, str, Path], T],
+    chart: ChartConfig,
+    run_date: str,
+    path: Path,
+    project: ProjectConfig,
+    logger,
+) -> T:
+    try:
+        return load(chart, run_date, path)
+    except ExcelReaderUnavailable as exc:
+        csv_path = path.with_suffix(".csv")
+        logger.warning("Direct XLSX load failed for %s (%s); loading via %s", chart.chart_id, exc, csv_path)
+        if not csv_path.exists():
+            xlsx_to_csv(path, csv_path, chart.sheet_name, engine=project.xlsx_engine)
+        return load(chart, run_date, csv_path)
+
+
+def _load_target(
+    warehouse: Warehouse,
+    target: TargetTableConfig,
+    context: RunContext,
+    project: ProjectConfig,
+    logger,
+) -> int:
+    if target.path and Path(target.path).exists():
+        rows = warehouse.get_unchanged_target_rows(target, Path(target.path))
+        if rows is not None:
+            logger.info("Target %s unchanged since last load; skipped reload", target.name)
+            return rows
+    source_path, resolved_path = _resolve_target_paths(target, context, logger, project)
+    try:
+        return warehouse.load_target_table(target, resolved_path=resolved_path, source_path=source_path)
+    except ExcelReaderUnavailable as exc:
+        output_path = _target_cache_path(target, context)
+        logger.warning("Direct XLSX load failed for target %s (%s); loading via %s", target.name, exc, output_path)
+        xlsx_to_csv(source_path, output_path, target.sheet_name, engine=project.xlsx_engine)
+        return warehouse.load_target_table(target, resolved_path=output_path, source_path=source_path)
+
+
+def _stage_raw(
+    warehouse: Warehouse,
+    chart: ChartConfig,
+    run_date: str,
+    context: RunContext,
+    project: ProjectConfig,
+    logger,
+) -> Path:
+    raw_path = _resolve_raw_source(context, chart, project, logger)
+    _load_raw(warehouse.stage_raw_file, chart, run_date, raw_path, project, logger)
+    return raw_path
+
+
+def _run_load_parallel(
+    config: PipelineConfig,
+    context: RunContext,
+    logger,
+    warehouse: Warehouse,
+    run_date: str,
+) -> LoadResult:
+    charts = config.bi.charts
+    target_rows: Dict[str, int] = {}
+    # Charts are parsed into stage tables on worker cursors, then swapped into raw.*
+    # in one transaction so a failed chart leaves every raw table untouched.
+    with warehouse.session(), ThreadPoolExecutor(max_workers=config.project.load_concurrency) as pool:
+        warehouse.attach_stage()
+        raw_futures = [
+            pool.submit(_stage_raw, warehouse, chart, run_date, context, config.project, logger)
+            for chart in charts
+        ]
+        target_futures = [
+            pool.submit(_load_target, warehouse, target, context, config.project, logger)
+            for target in config.targets.tables
+        ]
+        try:
+            raw_paths = [future.result() for future in raw_futures]
+            for target, future in zip(config.targets.tables, target_futures):
+                target_rows[target.name] = future.result()
+                logger.info("Loaded target %s rows for %s", target_rows[target.name], target.name)
+            raw_rows = warehouse.commit_staged_raw(run_date, charts)
+        except Exception:
+            for future in raw_futures + target_futures:
+                future.cancel()
+            raise
+        finally:
+            wait(raw_futures)
+            warehouse.drop_staged_raw()
+
+    for chart, raw_path in zip(charts, raw_paths):
+        logger.info("Loaded raw %s rows for %s from %s", raw_rows[chart.chart_id], chart.chart_id, raw_path.name)
+    return LoadResult(raw_rows=raw_rows, target_rows=target_rows)
+
+
+def run_load(
+    config: PipelineConfig,
+    context: RunContext,
+    logger,
+    warehouse: Optional[Warehouse] = None,
+) -> LoadResult:
+    warehouse = warehouse or Warehouse(context.warehouse_path)
     warehouse.init()
+    run_date = context.run_date.strftime("%Y-%m-%d")
+    if config.project.load_concurrency > 1:
+        return _run_load_parallel(config, context, logger, warehouse, run_date)
 
     raw_rows: Dict[str, int] = {}
     for chart in config.bi.charts:
-        csv_path = context.raw_dir / f"chart_id={chart.chart_id}" / "data.csv"
-        if not csv_path.exists():
-            raise FileNotFoundError(f"Missing raw CSV for chart {chart.chart_id}: {csv_path}")
-        rows = warehouse.load_raw_csv(chart, context.run_date.strftime("%Y-%m-%d"), csv_path)
+        raw_path = _resolve_raw_source(context, chart, config.project, logger)
+        rows = _load_raw(warehouse.load_raw_file, chart, run_date, raw_path, config.project, logger)
         raw_rows[chart.chart_id] = rows
-        logger.info("Loaded raw %s rows for %s", rows, chart.chart_id)
+        logger.info("Loaded raw %s rows for %s from %s", rows, chart.chart_id, raw_path.name)
 
     target_rows: Dict[str, int] = {}
     for target in config.targets.tables:
-        source_path, resolved_path = _resolve_target_paths(target, context, logger)
-        rows = warehouse.load_target_table(target, resolved_path=resolved_path, source_path=source_path)
+        rows = _load_target(warehouse, target, context, config.project, logger)
         target_rows[target.name] = rows
         logger.info("Loaded target %s rows for %s", rows, target.name)
 
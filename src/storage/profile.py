@@ -1,66 +1,161 @@
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Optional
 
 import duckdb
 
-from ..config.model import ChartConfig
+from ..config.model import ChartConfig, ProfileDriftConfig
 from ..core.context import RunContext
 from ..utils.fs import write_json
+from .raw import resolve_raw_path
+from .warehouse import Warehouse, source_sql
 
 
 def quote_ident(value: str) -> str:
     return '"' + value.replace('"', '""') + '"'
 
 
-def profile_raw_files(context: RunContext, charts: List[ChartConfig], sample_rows: int) -> Path:
+NUMERIC_PREFIXES = (
+    "TINYINT",
+    "SMALLINT",
+    "INTEGER",
+    "BIGINT",
+    "HUGEINT",
+    "UTINYINT",
+    "USMALLINT",
+    "UINTEGER",
+    "UBIGINT",
+    "FLOAT",
+    "REAL",
+    "DOUBLE",
+    "DECIMAL",
+)
+
+
+def _is_numeric(col_type: str) -> bool:
+    return col_type.upper().startswith(NUMERIC_PREFIXES)
+
+
+def _column_aggregates(name: str, col_type: str, approx: bool, top_k: int) -> List[str]:
+    quoted = quote_ident(name)
+    distinct = f"approx_count_distinct({quoted})" if approx else f"COUNT(DISTINCT {quoted})"
+    mean = f"AVG({quoted})::DOUBLE" if _is_numeric(col_type) else "NULL::DOUBLE"
+    return [
+        f"COUNT({quoted})",
+        distinct,
+        f"MIN({quoted})::VARCHAR",
+        f"MAX({quoted})::VARCHAR",
+        mean,
+        f"approx_top_k({quoted}, {int(top_k)})::VARCHAR[]",
+    ]
+
+
+def _profile_chart(
+    context: RunContext,
+    chart: ChartConfig,
+    sample_rows: int,
+    prefer_xlsx: bool,
+    top_k: int,
+    approx_threshold: int,
+) -> Dict:
+    raw_path = resolve_raw_path(context, chart, prefer_xlsx=prefer_xlsx)
+    entry = {
+        "chart_id": chart.chart_id,
+        "chart_name": chart.name,
+        "file_path": str(raw_path),
+        "exists": raw_path.exists(),
+    }
+    if not raw_path.exists():
+        return entry
+
+    with duckdb.connect() as con:
+        source = source_sql(con, raw_path, chart.sheet_name)
+        # The sample is parsed once into memory; every statistic below reads that copy.
+        limit = f" LIMIT {int(sample_rows)}" if sample_rows else ""
+        con.execute(f"CREATE TEMP TABLE sample AS SELECT * FROM {source}{limit}")
+        sampled = con.execute("SELECT COUNT(*) FROM sample").fetchone()[0]
+        if sample_rows and sampled >= sample_rows:
+            row_count = con.execute(f"SELECT COUNT(*) FROM {source}").fetchone()[0]
+        else:
+            row_count = sampled
+        entry["row_count"] = row_count
+        entry["sample_rows"] = sampled
+
+        columns = [(row[0], row[1]) for row in con.execute("DESCRIBE sample").fetchall()]
+        approx = sampled > approx_threshold
+        selects: List[str] = []
+        for name, col_type in columns:
+            selects.extend(_column_aggregates(name, col_type, approx, top_k))
+        values = con.execute(f"SELECT {', '.join(selects)} FROM sample").fetchone() if selects else ()
+
+    column_stats = []
+    for index, (name, col_type) in enumerate(columns):
+        non_null, distinct, min_value, max_value, mean, top_values = values[index * 6:(index + 1) * 6]
+        column_stats.append({
+            "name": name,
+            "type": col_type,
+            "sample_rows": sampled,
+            "sample_distinct": distinct,
+            "sample_nulls": sampled - non_null,
+            "distinct_approx": approx,
+            "min": min_value,
+            "max": max_value,
+            "mean": mean,
+            "top_values": top_values,
+        })
+    entry["columns"] = column_stats
+    return entry
+
+
+def profile_raw_files(
+    context: RunContext,
+    charts: List[ChartConfig],
+    sample_rows: int,
+    prefer_xlsx: bool = False,
+    concurrency: int = 1,
+    top_k: int = 5,
+    approx_threshold: int = 10000,
+    warehouse: Optional[Warehouse] = None,
+    drift: Optional[ProfileDriftConfig] = None,
+    logger=None,
+) -> Path:
     report = {
         "run_id": context.run_id,
         "run_date": context.run_date.strftime("%Y-%m-%d"),
         "charts": [],
     }
-    for chart in charts:
-        csv_path = context.raw_dir / f"chart_id={chart.chart_id}" / "data.csv"
-        entry = {
-            "chart_id": chart.chart_id,
-            "chart_name": chart.name,
-            "file_path": str(csv_path),
-            "exists": csv_path.exists(),
-        }
-        if not csv_path.exists():
-            report["charts"].append(entry)
-            continue
-
-        con = duckdb.connect()
-        con.execute("CREATE VIEW raw AS SELECT * FROM read_csv_auto(?)", [str(csv_path)])
-        row_count = con.execute("SELECT COUNT(*) FROM raw").fetchone()[0]
-        entry["row_count"] = row_count
-        entry["sample_rows"] = min(sample_rows, row_count) if sample_rows else row_count
-
-        columns = con.execute("DESCRIBE raw").fetchall()
-        column_stats = []
-        sample_query = "SELECT * FROM raw"
-        if sample_rows:
-            sample_query = f"SELECT * FROM raw LIMIT {sample_rows}"
-
-        for name, col_type, *_ in columns:
-            quoted = quote_ident(name)
-            stats = con.execute(
-                f"SELECT COUNT(*) AS rows, COUNT(DISTINCT {quoted}) AS distinct_count, "
-                f"SUM(CASE WHEN {quoted} IS NULL THEN 1 ELSE 0 END) AS null_count "
-                f"FROM ({sample_query})"
-            ).fetchone()
-            column_stats.append({
-                "name": name,
-                "type": col_type,
-                "sample_rows": stats[0],
-                "sample_distinct": stats[1],
-                "sample_nulls": stats[2],
-            })
-        entry["columns"] = column_stats
-        report["charts"].append(entry)
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [
+            pool.submit(_profile_chart, context, chart, sample_rows, prefer_xlsx, top_k, approx_threshold)
+            for chart in charts
+        ]
+        report["charts"] = [future.result() for future in futures]
+
+    if warehouse is not None:
+        run_date = context.run_date.strftime("%Y-%m-%d")
+        warehouse.init()
+        warehouse.record_column_profiles(run_date, [c for c in report["charts"] if c.get("exists")])
+        if drift is not None:
+            report["drift"] = warehouse.detect_profile_drift(
+                run_date,
+                drift.window_days,
+                drift.threshold,
+                drift.null_rate_threshold,
+            )
+            for item in report["drift"]:
+                if logger:
+                    logger.warning(
+                        "Profile drift %s %s %s: %s vs %s-day mean %s",
+                        item["chart_id"],
+                        item["column_name"] or "*",
+                        item["metric"],
+                        item["current_value"],
+                        item["days"],
+                        item["baseline_value"],
+                    )
 
     report_path = context.report_dir / f"profile_{context.run_date.strftime('%Y-%m-%d')}.json"
     write_json(report_path, report)
-    return report_path
\ No newline at end of file
+    return report_path
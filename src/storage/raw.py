@@ -1,19 +1,118 @@
 from __future__ import annotations
 
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Tuple
+
+import duckdb
 
 from ..config.model import ChartConfig
 from ..core.context import RunContext
 from ..utils.fs import ensure_dir, sha256_file
+from .warehouse import source_sql
+
+
+RAW_FILENAMES = ("data.parquet", "data.csv", "data.xlsx")
+
+# mkstemp creates files as 0600; committed raw files get the usual umask-derived mode.
+# The umask can only be read by setting it, so it is read once at import.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+RAW_FILE_MODE = 0o666 & ~_UMASK
+
+
+def chart_raw_dir(context: RunContext, chart: ChartConfig) -> Path:
+    return context.raw_dir / f"chart_id={chart.chart_id}"
+
+
+def resolve_raw_path(context: RunContext, chart: ChartConfig, prefer_xlsx: bool = False) -> Path:
+    chart_dir = chart_raw_dir(context, chart)
+    names = ["data.parquet", "data.xlsx", "data.csv"] if prefer_xlsx else list(RAW_FILENAMES)
+    for name in names:
+        path = chart_dir / name
+        if path.exists():
+            return path
+    return chart_dir / "data.csv"
+
+
+def write_raw_parquet(source_path: Path, sheet_name: Optional[str] = None) -> Tuple[Path, int]:
+    parquet_path = source_path.with_name("data.parquet")
+    tmp_path = parquet_path.with_name(".data.parquet.tmp")
+    tmp_str = str(tmp_path).replace("'", "''")
+    with duckdb.connect() as con:
+        relation = source_sql(con, source_path, sheet_name)
+        row_count = con.execute(
+            f"COPY (SELECT * FROM {relation}) TO '{tmp_str}' (FORMAT PARQUET, COMPRESSION ZSTD)"
+        ).fetchone()[0]
+    os.replace(tmp_path, parquet_path)
+    return parquet_path, int(row_count)
+
+
+def remove_stale_raw_files(path: Path, keep: Tuple[Path, ...]) -> None:
+    for name in RAW_FILENAMES:
+        candidate = path.parent / name
+        if candidate not in keep:
+            candidate.unlink(missing_ok=True)
+
+
+@dataclass
+class RawFile:
+    path: Path
+    file_size: int
+    sha256: str
+    line_count: Optional[int] = None
+
+    @property
+    def csv_row_count(self) -> Optional[int]:
+        if self.line_count is None:
+            return None
+        return max(self.line_count - 1, 0)
+
+
+class RawFileWriter:
+    def __init__(self, context: RunContext, chart: ChartConfig, extension: str, count_lines: bool = False) -> None:
+        chart_dir = ensure_dir(context.raw_dir / f"chart_id={chart.chart_id}")
+        self.path = chart_dir / f"data{extension}"
+        fd, tmp_name = tempfile.mkstemp(prefix=".data", suffix=f"{extension}.tmp", dir=chart_dir)
+        self._tmp_path = Path(tmp_name)
+        self._handle = os.fdopen(fd, "wb")
+        self._digest = hashlib.sha256()
+        self._size = 0
+        self._newlines: Optional[int] = 0 if count_lines else None
+        self._last_byte = b""
+
+    def write(self, chunk: bytes) -> None:
+        if not chunk:
+            return
+        self._handle.write(chunk)
+        self._digest.update(chunk)
+        self._size += len(chunk)
+        if self._newlines is not None:
+            self._newlines += chunk.count(b"\n")
+        self._last_byte = chunk[-1:]
+
+    def commit(self) -> RawFile:
+        self._handle.close()
+        os.chmod(self._tmp_path, RAW_FILE_MODE)
+        os.replace(self._tmp_path, self.path)
+        line_count = self._newlines
+        if line_count is not None and self._size and self._last_byte != b"\n":
+            line_count += 1
+        return RawFile(path=self.path, file_size=self._size, sha256=self._digest.hexdigest(), line_count=line_count)
+
+    def abort(self) -> None:
+        self._handle.close()
+        self._tmp_path.unlink(missing_ok=True)
 
+    def __enter__(self) -> "RawFileWriter":
+        return self
 
-def save_raw_bytes(context: RunContext, chart: ChartConfig, content: bytes, extension: str) -> Path:
-    chart_dir = ensure_dir(context.raw_dir / f"chart_id={chart.chart_id}")
-    filename = f"data{extension}"
-    path = chart_dir / filename
-    path.write_bytes(content)
-    return path
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            self.abort()
 
 
 def count_csv_rows(path: Path) -> int:
@@ -29,11 +128,13 @@ def count_csv_rows(path: Path) -> int:
 def build_export_record(
     chart: ChartConfig,
     file_path: Path,
-    csv_path: Path,
+    csv_path: Optional[Path],
     filters: dict,
     row_count: Optional[int],
     export_format: str,
     export_mode: str,
+    file_size: Optional[int] = None,
+    sha256: Optional[str] = None,
 ) -> dict:
     return {
         "chart_id": chart.chart_id,
@@ -41,9 +142,9 @@ def build_export_record(
         "export_format": export_format,
         "export_mode": export_mode,
         "file_path": str(file_path),
-        "csv_path": str(csv_path),
-        "file_size": file_path.stat().st_size,
-        "sha256": sha256_file(file_path),
+        "csv_path": str(csv_path) if csv_path else None,
+        "file_size": file_size if file_size is not None else file_path.stat().st_size,
+        "sha256": sha256 or sha256_file(file_path),
         "filters": filters,
         "row_count": row_count,
     }
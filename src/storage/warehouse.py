@@ -1,10 +1,11 @@
 from __future__ import annotations
 
 import json
-from dataclasses import dataclass
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 
 import duckdb
 
@@ -16,6 +17,50 @@ def quote_ident(value: str) -> str:
     return '"' + value.replace('"', '""') + '"'
 
 
+XLSX_SUFFIXES = {".xlsx", ".xlsm"}
+STAGE_CATALOG = "load_stage"
+
+
+class ExcelReaderUnavailable(RuntimeError):
+    pass
+
+
+_excel_install_error: Optional[str] = None
+
+
+def load_excel_extension(con: duckdb.DuckDBPyConnection) -> None:
+    global _excel_install_error
+    try:
+        con.execute("LOAD excel")
+        return
+    except duckdb.Error:
+        pass
+    # Remember a failed INSTALL so offline hosts don't retry the download per file.
+    if _excel_install_error is None:
+        try:
+            con.execute("INSTALL excel")
+            con.execute("LOAD excel")
+            return
+        except duckdb.Error as exc:
+            _excel_install_error = str(exc).splitlines()[0]
+    raise ExcelReaderUnavailable(f"DuckDB excel extension is unavailable: {_excel_install_error}")
+
+
+def source_sql(con: duckdb.DuckDBPyConnection, path: Path, sheet_name: Optional[str] = None) -> str:
+    path_str = str(path).replace("'", "''")
+    if path.suffix.lower() in XLSX_SUFFIXES:
+        load_excel_extension(con)
+        options = ", header = true"
+        if sheet_name:
+            options += ", sheet = '" + sheet_name.replace("'", "''") + "'"
+        return f"read_xlsx('{path_str}'{options})"
+    # Raw files live under run_date=/chart_id= directories; DuckDB would otherwise add
+    # those as hive partition columns.
+    if path.suffix.lower() == ".parquet":
+        return f"read_parquet('{path_str}', hive_partitioning = false)"
+    return f"read_csv_auto('{path_str}', hive_partitioning = false)"
+
+
 def load_schema(schema_path: Optional[str]) -> Optional[List[Dict[str, str]]]:
     if not schema_path:
         return None
@@ -26,13 +71,66 @@ def load_schema(schema_path: Optional[str]) -> Optional[List[Dict[str, str]]]:
     return payload.get("columns", [])
 
 
+def _schema_sha256(schema_path: Optional[str]) -> Optional[str]:
+    if not schema_path:
+        return None
+    path = Path(schema_path)
+    if not path.exists():
+        return None
+    return sha256_file(path)
+
+
 @dataclass
 class Warehouse:
     path: Path
+    open_count: int = field(default=0, init=False)
+    checkpoint_count: int = field(default=0, init=False)
+    _con: Optional[duckdb.DuckDBPyConnection] = field(default=None, init=False, repr=False)
 
-    def connect(self) -> duckdb.DuckDBPyConnection:
+    def _open(self) -> duckdb.DuckDBPyConnection:
+        self.open_count += 1
         return duckdb.connect(str(self.path))
 
+    @contextmanager
+    def session(self) -> Iterator["Warehouse"]:
+        if self._con is not None:
+            yield self
+            return
+        self._con = self._open()
+        try:
+            yield self
+        finally:
+            try:
+                self.checkpoint()
+            finally:
+                self._con.close()
+                self._con = None
+
+    @contextmanager
+    def connect(self) -> Iterator[duckdb.DuckDBPyConnection]:
+        # Inside a session every caller gets its own cursor on the shared connection,
+        # so concurrent readers never share a DuckDB connection object.
+        if self._con is not None:
+            cursor = self._con.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+            return
+        con = self._open()
+        try:
+            yield con
+        finally:
+            con.close()
+
+    def checkpoint(self) -> None:
+        with self.connect() as con:
+            con.execute("CHECKPOINT")
+        self.checkpoint_count += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {"opens": self.open_count, "checkpoints": self.checkpoint_count}
+
     def init(self) -> None:
         with self.connect() as con:
             con.execute("CREATE SCHEMA IF NOT EXISTS raw")
@@ -63,6 +161,90 @@ class Warehouse:
                 )
                 """
             )
+            con.execute("ALTER TABLE ops.target_versions ADD COLUMN IF NOT EXISTS file_size BIGINT")
+            con.execute("ALTER TABLE ops.target_versions ADD COLUMN IF NOT EXISTS file_mtime DOUBLE")
+            con.execute("ALTER TABLE ops.target_versions ADD COLUMN IF NOT EXISTS schema_sha256 VARCHAR")
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ops.raw_partitions (
+                    table_name VARCHAR,
+                    run_date DATE,
+                    row_count BIGINT,
+                    content_hash VARCHAR,
+                    loaded_at TIMESTAMP,
+                    PRIMARY KEY (table_name, run_date)
+                )
+                """
+            )
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ops.transform_cache (
+                    model_name VARCHAR,
+                    partition_key VARCHAR,
+                    fingerprint VARCHAR,
+                    row_count BIGINT,
+                    built_at TIMESTAMP,
+                    PRIMARY KEY (model_name, partition_key)
+                )
+                """
+            )
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ops.transform_profile (
+                    run_id VARCHAR,
+                    run_date DATE,
+                    model_name VARCHAR,
+                    wall_seconds DOUBLE,
+                    latency DOUBLE,
+                    cpu_time DOUBLE,
+                    peak_memory_bytes BIGINT,
+                    rows_scanned BIGINT,
+                    rows_returned BIGINT,
+                    operators STRUCT(
+                        operator_name VARCHAR,
+                        depth INTEGER,
+                        timing DOUBLE,
+                        cardinality BIGINT,
+                        rows_scanned BIGINT
+                    )[],
+                    plan VARCHAR,
+                    recorded_at TIMESTAMP
+                )
+                """
+            )
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ops.column_profile (
+                    chart_id VARCHAR,
+                    run_date DATE,
+                    column_name VARCHAR,
+                    column_type VARCHAR,
+                    row_count BIGINT,
+                    sample_rows BIGINT,
+                    null_count BIGINT,
+                    distinct_count BIGINT,
+                    distinct_approx BOOLEAN,
+                    min_value VARCHAR,
+                    max_value VARCHAR,
+                    mean DOUBLE,
+                    top_values VARCHAR[],
+                    profiled_at TIMESTAMP,
+                    PRIMARY KEY (chart_id, run_date, column_name)
+                )
+                """
+            )
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ops.task_durations (
+                    run_id VARCHAR,
+                    chart_id VARCHAR,
+                    export_mode VARCHAR,
+                    export_format VARCHAR,
+                    seconds DOUBLE,
+                    recorded_at TIMESTAMP
+                )
+                """
+            )
             con.execute(
                 """
                 CREATE TABLE IF NOT EXISTS ops.publish_history (
@@ -75,6 +257,21 @@ class Warehouse:
                 )
                 """
             )
+            con.execute("ALTER TABLE ops.publish_history ADD COLUMN IF NOT EXISTS request_count BIGINT")
+            con.execute("ALTER TABLE ops.publish_history ADD COLUMN IF NOT EXISTS batch_rows BIGINT")
+            con.execute("ALTER TABLE ops.publish_history ADD COLUMN IF NOT EXISTS batch_bytes BIGINT")
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ops.publish_snapshot (
+                    sheet_name VARCHAR PRIMARY KEY,
+                    start_cell VARCHAR,
+                    include_header BOOLEAN,
+                    columns VARCHAR[],
+                    row_hashes UBIGINT[],
+                    updated_at TIMESTAMP
+                )
+                """
+            )
 
     def record_run_start(self, run_id: str, run_date: str) -> None:
         with self.connect() as con:
@@ -98,43 +295,119 @@ class Warehouse:
                 [status, datetime.utcnow(), error, metrics_payload, run_id],
             )
 
+    def get_task_duration_estimates(self, history_runs: int) -> Dict[Tuple[str, str, str], float]:
+        with self.connect() as con:
+            rows = con.execute(
+                """
+                SELECT chart_id, export_mode, export_format, MEDIAN(seconds)
+                FROM (
+                    SELECT *, ROW_NUMBER() OVER (
+                        PARTITION BY chart_id, export_mode, export_format
+                        ORDER BY recorded_at DESC
+                    ) AS rn
+                    FROM ops.task_durations
+                )
+                WHERE rn <= ?
+                GROUP BY chart_id, export_mode, export_format
+                """,
+                [history_runs],
+            ).fetchall()
+        return {(row[0], row[1], row[2]): float(row[3]) for row in rows}
+
+    def record_task_duration(self, run_id: str, chart_id: str, export_mode: str, export_format: str, seconds: float) -> None:
+        with self.connect() as con:
+            con.execute(
+                "INSERT INTO ops.task_durations VALUES (?, ?, ?, ?, ?, ?)",
+                [run_id, chart_id, export_mode, export_format, seconds, datetime.utcnow()],
+            )
+
     def raw_table_name(self, chart: ChartConfig) -> str:
         return f"raw.chart_{chart.chart_id}"
 
-    def load_raw_csv(self, chart: ChartConfig, run_date: str, file_path: Path) -> int:
+    def stage_table_name(self, chart: ChartConfig) -> str:
+        return f"{STAGE_CATALOG}.chart_{chart.chart_id}"
+
+    def _raw_select_sql(self, chart: ChartConfig, run_date: str, source: str) -> str:
+        schema = load_schema(chart.schema_path)
+        if schema:
+            cast_cols = ", ".join(
+                f"CAST({quote_ident(c['name'])} AS {c['type']}) AS {quote_ident(c['name'])}"
+                for c in schema
+            )
+            return (
+                f"SELECT {cast_cols}, DATE '{run_date}' AS run_date, CURRENT_TIMESTAMP AS loaded_at "
+                f"FROM {source}"
+            )
+        return f"SELECT *, DATE '{run_date}' AS run_date, CURRENT_TIMESTAMP AS loaded_at FROM {source}"
+
+    def _replace_raw_partition(
+        self,
+        con: duckdb.DuckDBPyConnection,
+        chart: ChartConfig,
+        run_date: str,
+        select_sql: str,
+    ) -> int:
         schema = load_schema(chart.schema_path)
         table = self.raw_table_name(chart)
-        path_str = str(file_path).replace("'", "''")
+        if schema:
+            cols = ", ".join(f"{quote_ident(c['name'])} {c['type']}" for c in schema)
+            con.execute(f"CREATE TABLE IF NOT EXISTS {table} ({cols}, run_date DATE, loaded_at TIMESTAMP)")
+        else:
+            con.execute(f"CREATE TABLE IF NOT EXISTS {table} AS {select_sql} LIMIT 0")
+
+        con.execute(f"DELETE FROM {table} WHERE run_date = DATE '{run_date}'")
+        con.execute(f"INSERT INTO {table} {select_sql}")
+        # The content hash ignores loaded_at so a reload of identical data keeps the same hash.
+        row_count, content_hash = con.execute(
+            f"""
+            SELECT COUNT(*), SUM(hash(*COLUMNS(* EXCLUDE (run_date, loaded_at)))::HUGEINT)
+            FROM {table}
+            WHERE run_date = DATE '{run_date}'
+            """
+        ).fetchone()
+        con.execute(
+            "INSERT OR REPLACE INTO ops.raw_partitions VALUES (?, ?, ?, ?, ?)",
+            [table, run_date, row_count, str(content_hash or 0), datetime.utcnow()],
+        )
+        return row_count
 
+    def load_raw_file(self, chart: ChartConfig, run_date: str, file_path: Path) -> int:
         with self.connect() as con:
-            if schema:
-                cols = ", ".join(f"{quote_ident(c['name'])} {c['type']}" for c in schema)
-                con.execute(
-                    f"CREATE TABLE IF NOT EXISTS {table} ({cols}, run_date DATE, loaded_at TIMESTAMP)"
-                )
-                cast_cols = ", ".join(
-                    f"CAST({quote_ident(c['name'])} AS {c['type']}) AS {quote_ident(c['name'])}"
-                    for c in schema
-                )
-                select_sql = (
-                    f"SELECT {cast_cols}, DATE '{run_date}' AS run_date, CURRENT_TIMESTAMP AS loaded_at "
-                    f"FROM read_csv_auto('{path_str}')"
-                )
-            else:
-                con.execute(
-                    f"CREATE TABLE IF NOT EXISTS {table} AS "
-                    f"SELECT *, DATE '{run_date}' AS run_date, CURRENT_TIMESTAMP AS loaded_at "
-                    f"FROM read_csv_auto('{path_str}') LIMIT 0"
-                )
-                select_sql = (
-                    f"SELECT *, DATE '{run_date}' AS run_date, CURRENT_TIMESTAMP AS loaded_at "
-                    f"FROM read_csv_auto('{path_str}')"
-                )
+            source = source_sql(con, file_path, chart.sheet_name)
+            return self._replace_raw_partition(con, chart, run_date, self._raw_select_sql(chart, run_date, source))
 
-            con.execute(f"DELETE FROM {table} WHERE run_date = DATE '{run_date}'")
-            con.execute(f"INSERT INTO {table} {select_sql}")
-            row_count = con.execute(f"SELECT COUNT(*) FROM {table} WHERE run_date = DATE '{run_date}'").fetchone()[0]
-        return row_count
+    def attach_stage(self) -> None:
+        # Call once per session before any stage_raw_file; concurrent ATTACHes of the same
+        # name race inside DuckDB.
+        with self.connect() as con:
+            con.execute(f"ATTACH IF NOT EXISTS ':memory:' AS {STAGE_CATALOG}")
+
+    def stage_raw_file(self, chart: ChartConfig, run_date: str, file_path: Path) -> str:
+        # Parses the file into an in-memory stage table; safe to call from several threads
+        # in a session after attach_stage, since the attached catalog is shared by all cursors.
+        stage = self.stage_table_name(chart)
+        with self.connect() as con:
+            source = source_sql(con, file_path, chart.sheet_name)
+            con.execute(f"CREATE OR REPLACE TABLE {stage} AS {self._raw_select_sql(chart, run_date, source)}")
+        return stage
+
+    def commit_staged_raw(self, run_date: str, charts: List[ChartConfig]) -> Dict[str, int]:
+        rows: Dict[str, int] = {}
+        with self.connect() as con:
+            con.execute("BEGIN TRANSACTION")
+            try:
+                for chart in charts:
+                    select_sql = f"SELECT * FROM {self.stage_table_name(chart)}"
+                    rows[chart.chart_id] = self._replace_raw_partition(con, chart, run_date, select_sql)
+                con.execute("COMMIT")
+            except Exception:
+                con.execute("ROLLBACK")
+                raise
+        return rows
+
+    def drop_staged_raw(self) -> None:
+        with self.connect() as con:
+            con.execute(f"DETACH DATABASE IF EXISTS {STAGE_CATALOG}")
 
     def load_target_table(
         self,
@@ -151,11 +424,11 @@ class Warehouse:
         resolved = resolved_path or Path(target.path)
         if not resolved.exists():
             raise FileNotFoundError(f"Target file not found: {resolved}")
-        path_str = str(resolved).replace("'", "''")
         source = source_path or resolved
         table = f"dim.{target.name}"
 
         with self.connect() as con:
+            relation = source_sql(con, resolved, target.sheet_name)
             if schema:
                 cols = ", ".join(f"{quote_ident(c['name'])} {c['type']}" for c in schema)
                 con.execute(f"CREATE TABLE IF NOT EXISTS {table} ({cols})")
@@ -165,18 +438,323 @@ class Warehouse:
                 )
                 con.execute(f"DELETE FROM {table}")
                 con.execute(
-                    f"INSERT INTO {table} SELECT {cast_cols} FROM read_csv_auto('{path_str}')"
+                    f"INSERT INTO {table} SELECT {cast_cols} FROM {relation}"
                 )
             else:
-                con.execute(f"CREATE OR REPLACE TABLE {table} AS SELECT * FROM read_csv_auto('{path_str}')")
+                con.execute(f"CREATE OR REPLACE TABLE {table} AS SELECT * FROM {relation}")
 
             row_count = con.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            self._record_target_version(con, target, source, sha256_file(source), row_count)
+
+        return row_count
+
+    def _record_target_version(
+        self,
+        con: duckdb.DuckDBPyConnection,
+        target: TargetTableConfig,
+        source: Path,
+        sha256: str,
+        row_count: int,
+    ) -> None:
+        stat = source.stat()
+        con.execute(
+            """
+            INSERT INTO ops.target_versions
+                (target_name, file_path, sha256, row_count, loaded_at, file_size, file_mtime, schema_sha256)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            [
+                target.name,
+                str(source),
+                sha256,
+                row_count,
+                datetime.utcnow(),
+                stat.st_size,
+                stat.st_mtime,
+                _schema_sha256(target.schema_path),
+            ],
+        )
+
+    def get_unchanged_target_rows(self, target: TargetTableConfig, source: Path) -> Optional[int]:
+        # Returns the recorded row count when dim.<name> already holds this exact file.
+        with self.connect() as con:
+            latest = con.execute(
+                """
+                SELECT file_path, sha256, row_count, file_size, file_mtime, schema_sha256
+                FROM ops.target_versions
+                WHERE target_name = ?
+                ORDER BY loaded_at DESC
+                LIMIT 1
+                """,
+                [target.name],
+            ).fetchone()
+            if not latest:
+                return None
+            file_path, sha256, row_count, file_size, file_mtime, schema_sha256 = latest
+            if file_path != str(source) or schema_sha256 != _schema_sha256(target.schema_path):
+                return None
+            exists = con.execute(
+                "SELECT COUNT(*) FROM duckdb_tables() WHERE schema_name = 'dim' AND table_name = ?",
+                [target.name],
+            ).fetchone()[0]
+            if not exists:
+                return None
+
+            stat = source.stat()
+            if stat.st_size == file_size and stat.st_mtime == file_mtime:
+                return int(row_count)
+            if stat.st_size != file_size and file_size is not None:
+                return None
+            if sha256_file(source) != sha256:
+                return None
+            # Same content under a new mtime (e.g. re-copied file): remember it so the
+            # next run takes the stat-only path again.
+            self._record_target_version(con, target, source, sha256, row_count)
+        return int(row_count)
+
+    def table_exists(self, table: str) -> bool:
+        schema_name, table_name = table.split(".", 1)
+        with self.connect() as con:
+            row = con.execute(
+                """
+                SELECT COUNT(*) FROM duckdb_tables() WHERE schema_name = ? AND table_name = ?
+                UNION ALL
+                SELECT COUNT(*) FROM duckdb_views() WHERE schema_name = ? AND view_name = ?
+                """,
+                [schema_name, table_name, schema_name, table_name],
+            ).fetchall()
+        return any(count for (count,) in row)
+
+    def input_version(self, table: str) -> Optional[str]:
+        # Cheap content version for a transform input, read from the ops bookkeeping
+        # written by load/transform instead of scanning the table. None means unknown.
+        schema_name, table_name = table.split(".", 1)
+        with self.connect() as con:
+            if schema_name == "raw":
+                row = con.execute(
+                    """
+                    SELECT string_agg(run_date || ':' || row_count || ':' || content_hash, ',' ORDER BY run_date)
+                    FROM ops.raw_partitions
+                    WHERE table_name = ?
+                    """,
+                    [table],
+                ).fetchone()
+            elif schema_name == "dim":
+                row = con.execute(
+                    """
+                    SELECT sha256 || ':' || row_count || ':' || COALESCE(schema_sha256, '')
+                    FROM ops.target_versions
+                    WHERE target_name = ?
+                    ORDER BY loaded_at DESC
+                    LIMIT 1
+                    """,
+                    [table_name],
+                ).fetchone()
+            else:
+                row = con.execute(
+                    """
+                    SELECT string_agg(partition_key || ':' || fingerprint, ',' ORDER BY partition_key)
+                    FROM ops.transform_cache
+                    WHERE model_name = ?
+                    """,
+                    [table],
+                ).fetchone()
+        return row[0] if row else None
+
+    def get_transform_cache(self, model_name: str, partition_key: str) -> Optional[Tuple[str, int]]:
+        with self.connect() as con:
+            row = con.execute(
+                "SELECT fingerprint, row_count FROM ops.transform_cache WHERE model_name = ? AND partition_key = ?",
+                [model_name, partition_key],
+            ).fetchone()
+        if not row:
+            return None
+        return row[0], int(row[1])
+
+    def record_transform_cache(self, model_name: str, partition_key: str, fingerprint: Optional[str], row_count: int) -> None:
+        with self.connect() as con:
+            if fingerprint is None:
+                con.execute(
+                    "DELETE FROM ops.transform_cache WHERE model_name = ? AND partition_key = ?",
+                    [model_name, partition_key],
+                )
+                return
             con.execute(
-                "INSERT INTO ops.target_versions VALUES (?, ?, ?, ?, ?)",
-                [target.name, str(source), sha256_file(source), row_count, datetime.utcnow()],
+                "INSERT OR REPLACE INTO ops.transform_cache VALUES (?, ?, ?, ?, ?)",
+                [model_name, partition_key, fingerprint, row_count, datetime.utcnow()],
             )
 
-        return row_count
+    def record_transform_profile(self, run_id: str, run_date: str, model_name: str, profile) -> None:
+        with self.connect() as con:
+            con.execute(
+                "INSERT INTO ops.transform_profile VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    run_id,
+                    run_date,
+                    model_name,
+                    profile.wall_seconds,
+                    profile.latency,
+                    profile.cpu_time,
+                    profile.peak_memory_bytes,
+                    profile.rows_scanned,
+                    profile.rows_returned,
+                    profile.operators,
+                    profile.plan,
+                    datetime.utcnow(),
+                ],
+            )
+
+    def get_transform_stats(self, runs: int, limit: int) -> Tuple[List[tuple], List[tuple]]:
+        recent = """
+            SELECT *
+            FROM ops.transform_profile
+            WHERE run_id IN (
+                SELECT run_id FROM ops.transform_profile
+                GROUP BY run_id
+                ORDER BY MAX(recorded_at) DESC
+                LIMIT ?
+            )
+        """
+        with self.connect() as con:
+            models = con.execute(
+                f"""
+                SELECT model_name, AVG(wall_seconds), MAX(wall_seconds), AVG(peak_memory_bytes), COUNT(*)
+                FROM ({recent})
+                GROUP BY model_name
+                ORDER BY AVG(wall_seconds) DESC
+                LIMIT ?
+                """,
+                [runs, limit],
+            ).fetchall()
+            operators = con.execute(
+                f"""
+                SELECT model_name, op.operator_name, AVG(op.timing), MAX(op.timing), AVG(op.cardinality)
+                FROM (SELECT model_name, UNNEST(operators) AS op FROM ({recent}))
+                GROUP BY model_name, op.operator_name
+                ORDER BY AVG(op.timing) DESC
+                LIMIT ?
+                """,
+                [runs, limit],
+            ).fetchall()
+        return models, operators
+
+    def record_column_profiles(self, run_date: str, charts: List[Dict]) -> None:
+        rows = []
+        profiled_at = datetime.utcnow()
+        for chart in charts:
+            for column in chart.get("columns", []):
+                rows.append(
+                    [
+                        chart["chart_id"],
+                        run_date,
+                        column["name"],
+                        column["type"],
+                        chart["row_count"],
+                        column["sample_rows"],
+                        column["sample_nulls"],
+                        column["sample_distinct"],
+                        column["distinct_approx"],
+                        column["min"],
+                        column["max"],
+                        column["mean"],
+                        column["top_values"],
+                        profiled_at,
+                    ]
+                )
+        if not rows:
+            return
+        with self.connect() as con:
+            con.executemany(
+                "INSERT OR REPLACE INTO ops.column_profile VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def detect_profile_drift(
+        self,
+        run_date: str,
+        window_days: int,
+        threshold: float,
+        null_rate_threshold: float,
+    ) -> List[Dict]:
+        # Compares run_date against the mean of the previous window_days of history.
+        # Counts are flagged on relative change, null rates on absolute change.
+        with self.connect() as con:
+            cursor = con.execute(
+                """
+                WITH profile AS (
+                    SELECT
+                        chart_id,
+                        column_name,
+                        run_date,
+                        row_count::DOUBLE AS row_count,
+                        null_count::DOUBLE / NULLIF(sample_rows, 0) AS null_rate,
+                        distinct_count::DOUBLE AS distinct_count
+                    FROM ops.column_profile
+                    WHERE run_date BETWEEN $run_date::DATE - $window_days::INTEGER AND $run_date::DATE
+                ),
+                -- row_count is a chart-level figure repeated on every column row, so it is
+                -- compared per chart; columns added mid-window would otherwise each bring
+                -- their own baseline.
+                chart_rows AS (
+                    SELECT chart_id, run_date, MAX(row_count) AS row_count
+                    FROM profile
+                    GROUP BY chart_id, run_date
+                ),
+                row_drift AS (
+                    SELECT
+                        c.chart_id,
+                        NULL::VARCHAR AS column_name,
+                        'row_count' AS metric,
+                        c.row_count AS current_value,
+                        h.row_count AS baseline_value,
+                        h.days
+                    FROM (SELECT * FROM chart_rows WHERE run_date = $run_date::DATE) c
+                    JOIN (
+                        SELECT chart_id, AVG(row_count) AS row_count, COUNT(*) AS days
+                        FROM chart_rows
+                        WHERE run_date < $run_date::DATE
+                        GROUP BY chart_id
+                    ) h USING (chart_id)
+                ),
+                curr AS (SELECT * FROM profile WHERE run_date = $run_date::DATE),
+                hist AS (
+                    SELECT
+                        chart_id,
+                        column_name,
+                        AVG(null_rate) AS null_rate,
+                        AVG(distinct_count) AS distinct_count,
+                        COUNT(*) AS days
+                    FROM profile
+                    WHERE run_date < $run_date::DATE
+                    GROUP BY chart_id, column_name
+                ),
+                column_drift AS (
+                    SELECT c.chart_id, c.column_name, m.metric, m.current_value, m.baseline_value, h.days
+                    FROM curr c
+                    JOIN hist h USING (chart_id, column_name),
+                    LATERAL (
+                        VALUES
+                            ('null_rate', c.null_rate, h.null_rate),
+                            ('distinct_count', c.distinct_count, h.distinct_count)
+                    ) AS m(metric, current_value, baseline_value)
+                )
+                SELECT chart_id, column_name, metric, current_value, baseline_value, days
+                FROM (SELECT * FROM row_drift UNION ALL SELECT * FROM column_drift)
+                WHERE CASE metric
+                    WHEN 'null_rate' THEN ABS(current_value - baseline_value) > $null_rate_threshold
+                    ELSE ABS(current_value - baseline_value) > $threshold * GREATEST(baseline_value, 1)
+                END
+                ORDER BY chart_id, metric, column_name
+                """,
+                {
+                    "run_date": run_date,
+                    "window_days": window_days,
+                    "threshold": threshold,
+                    "null_rate_threshold": null_rate_threshold,
+                },
+            )
+            cols = [desc[0] for desc in cursor.description]
+            return [dict(zip(cols, row)) for row in cursor.fetchall()]
 
     def get_last_publish(self, sheet_name: str) -> Optional[Tuple[int, int]]:
         with self.connect() as con:
@@ -194,9 +772,75 @@ class Warehouse:
             return None
         return int(row[0]), int(row[1])
 
-    def record_publish(self, run_id: str, run_date: str, sheet_name: str, row_count: int, col_count: int) -> None:
+    def get_last_batch_bytes(self, sheet_name: str) -> Optional[int]:
+        with self.connect() as con:
+            row = con.execute(
+                """
+                SELECT batch_bytes
+                FROM ops.publish_history
+                WHERE sheet_name = ? AND batch_bytes IS NOT NULL
+                ORDER BY published_at DESC
+                LIMIT 1
+                """,
+                [sheet_name],
+            ).fetchone()
+        return int(row[0]) if row else None
+
+    def record_publish(
+        self,
+        run_id: str,
+        run_date: str,
+        sheet_name: str,
+        row_count: int,
+        col_count: int,
+        request_count: Optional[int] = None,
+        batch_rows: Optional[int] = None,
+        batch_bytes: Optional[int] = None,
+    ) -> None:
+        with self.connect() as con:
+            con.execute(
+                """
+                INSERT INTO ops.publish_history
+                    (run_id, run_date, sheet_name, row_count, col_count, published_at, request_count, batch_rows, batch_bytes)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    run_id,
+                    run_date,
+                    sheet_name,
+                    row_count,
+                    col_count,
+                    datetime.utcnow(),
+                    request_count,
+                    batch_rows,
+                    batch_bytes,
+                ],
+            )
+
+    def get_publish_snapshot(self, sheet_name: str) -> Optional[Tuple[str, bool, List[str], List[int]]]:
+        with self.connect() as con:
+            row = con.execute(
+                "SELECT start_cell, include_header, columns, row_hashes FROM ops.publish_snapshot WHERE sheet_name = ?",
+                [sheet_name],
+            ).fetchone()
+        if not row:
+            return None
+        return row[0], row[1], list(row[2]), list(row[3])
+
+    def record_publish_snapshot(
+        self,
+        sheet_name: str,
+        start_cell: str,
+        include_header: bool,
+        columns: List[str],
+        row_hashes: List[int],
+    ) -> None:
         with self.connect() as con:
             con.execute(
-                "INSERT INTO ops.publish_history VALUES (?, ?, ?, ?, ?, ?)",
-                [run_id, run_date, sheet_name, row_count, col_count, datetime.utcnow()],
+                """
+                INSERT OR REPLACE INTO ops.publish_snapshot
+                    (sheet_name, start_cell, include_header, columns, row_hashes, updated_at)
+                VALUES (?, ?, ?, ?, ?::UBIGINT[], ?)
+                """,
+                [sheet_name, start_cell, include_header, columns, row_hashes, datetime.utcnow()],
             )
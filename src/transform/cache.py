@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+import hashlib
+from typing import Optional
+
+from ..storage import Warehouse
+from .dag import TransformModel
+
+
+def partition_key(model: TransformModel, run_date: str) -> str:
+    return run_date if model.materialized == "incremental" else ""
+
+
+def model_fingerprint(warehouse: Warehouse, model: TransformModel, rendered: str) -> Optional[str]:
+    digest = hashlib.sha256()
+    digest.update((model.materialized or "script").encode("utf-8"))
+    digest.update(rendered.encode("utf-8"))
+    for ref in sorted(model.refs - {model.name}):
+        version = warehouse.input_version(ref)
+        if version is None:
+            return None
+        digest.update(f"\n{ref}={version}".encode("utf-8"))
+    return digest.hexdigest()
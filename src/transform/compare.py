@@ -1,15 +1,20 @@
 from __future__ import annotations
 
+import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 
 import duckdb
 
 from ..config.model import PipelineConfig
 from ..core.context import RunContext
-from ..utils.fs import write_json
-from ..storage.warehouse import quote_ident
+from ..utils.fs import ensure_dir, sha256_file, write_json
+from ..storage.warehouse import Warehouse, quote_ident
+from .diff import diff_tables
 
 
 NUMERIC_TYPES = {
@@ -25,89 +30,198 @@ NUMERIC_TYPES = {
 }
 
 
+DECIMAL_RE = re.compile(r"^DECIMAL\((\d+),\s*(\d+)\)$")
+
+
 def _baseline_path(baseline_dir: Path, table: str) -> Path:
     return baseline_dir / f"{table}.csv"
 
 
-def _fetch_records(con: duckdb.DuckDBPyConnection, query: str, params: List) -> List[dict]:
-    cursor = con.execute(query, params)
-    cols = [desc[0] for desc in cursor.description]
-    rows = cursor.fetchall()
-    return [dict(zip(cols, row)) for row in rows]
+def _describe(con: duckdb.DuckDBPyConnection, relation: str) -> List[Tuple[str, str]]:
+    return [(row[0], row[1]) for row in con.execute(f"DESCRIBE SELECT * FROM {relation}").fetchall()]
+
 
+def _needs_rounding(col_type: str, rounding: int) -> bool:
+    # ROUND is a no-op on integers and on decimals with scale <= rounding; skipping it
+    # matters for wide decimals, where ROUND runs on 128-bit values.
+    col_type_upper = col_type.upper()
+    if not any(col_type_upper.startswith(t) for t in NUMERIC_TYPES):
+        return False
+    match = DECIMAL_RE.match(col_type_upper)
+    if match:
+        return int(match.group(2)) > rounding
+    return col_type_upper in {"DOUBLE", "REAL"}
 
-def _select_with_rounding(con: duckdb.DuckDBPyConnection, table: str, rounding: int) -> str:
-    columns = con.execute(f"DESCRIBE {table}").fetchall()
+
+def _rounded_select(columns: List[Tuple[str, str]], rounding: int) -> str:
     selects: List[str] = []
-    for name, col_type, *_ in columns:
-        col_type_upper = col_type.upper()
-        if any(col_type_upper.startswith(t) for t in NUMERIC_TYPES):
+    for name, col_type in columns:
+        if _needs_rounding(col_type, rounding):
             selects.append(f"ROUND({quote_ident(name)}, {rounding}) AS {quote_ident(name)}")
         else:
             selects.append(f"{quote_ident(name)}")
     return ", ".join(selects)
 
 
+def _baseline_snapshot(baseline_path: Path, cache_dir: Path) -> Path:
+    # Parsed baselines are cached as Parquet keyed by the CSV's sha256, so unchanged
+    # baselines skip CSV parsing and type inference on later compares.
+    digest = sha256_file(baseline_path)
+    snapshot = cache_dir / f"{baseline_path.stem}-{digest[:16]}.parquet"
+    if snapshot.exists():
+        return snapshot
+    ensure_dir(cache_dir)
+    # Concurrent compares of the same table each write their own temp file; the last
+    # os.replace wins with an identical snapshot.
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{snapshot.name}.", suffix=".tmp", dir=cache_dir)
+    os.close(fd)
+    tmp_path = Path(tmp_name)
+    source = str(baseline_path).replace("'", "''")
+    target = str(tmp_path).replace("'", "''")
+    try:
+        with duckdb.connect() as con:
+            con.execute(f"COPY (SELECT * FROM read_csv_auto('{source}')) TO '{target}' (FORMAT PARQUET)")
+        os.replace(tmp_path, snapshot)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    for stale in cache_dir.glob(f"{baseline_path.stem}-*.parquet"):
+        if stale != snapshot:
+            stale.unlink(missing_ok=True)
+    return snapshot
+
+
+def _baseline_source(baseline_path: Path) -> str:
+    path_str = str(baseline_path).replace("'", "''")
+    if baseline_path.suffix == ".parquet":
+        return f"read_parquet('{path_str}')"
+    return f"read_csv_auto('{path_str}')"
+
+
+def _common_type(con: duckdb.DuckDBPyConnection, left: str, right: str) -> str:
+    # DuckDB's UNION type resolution gives the narrowest type both sides cast to
+    # losslessly; VARCHAR when there is none.
+    if left == right:
+        return left
+    try:
+        return con.execute(
+            f"SELECT typeof(v) FROM (SELECT NULL::{left} AS v UNION ALL SELECT NULL::{right}) LIMIT 1"
+        ).fetchone()[0]
+    except duckdb.Error:
+        return "VARCHAR"
+
+
+def _typed_select(columns: List[Tuple[str, str]], names: List[str], types: List[str]) -> str:
+    return ", ".join(
+        f"CAST({quote_ident(source)} AS {col_type}) AS {quote_ident(name)}"
+        for (source, _), name, col_type in zip(columns, names, types)
+    )
+
+
+def _materialize_sides(
+    con: duckdb.DuckDBPyConnection,
+    table: str,
+    baseline_path: Path,
+    rounding: int,
+) -> List[str]:
+    # Columns are matched by position (as EXCEPT did). Both sides are cast to a common
+    # supertype, so a baseline 1.5 never becomes a current INTEGER 2 and 'N/A' never
+    # becomes NULL; the baseline is read once into a temp table.
+    source = _baseline_source(baseline_path)
+    columns = _describe(con, table)
+    base_columns = _describe(con, source)
+    if len(base_columns) != len(columns):
+        raise ValueError(
+            f"Baseline {baseline_path} has {len(base_columns)} columns, expected {len(columns)}"
+        )
+    names = [name for name, _ in columns]
+    types = [_common_type(con, base_type, col_type) for (_, base_type), (_, col_type) in zip(base_columns, columns)]
+    typed_columns = list(zip(names, types))
+    con.execute(
+        f"CREATE OR REPLACE TEMP VIEW curr AS SELECT {_rounded_select(typed_columns, rounding)} "
+        f"FROM (SELECT {_typed_select(columns, names, types)} FROM {table})"
+    )
+    con.execute(
+        f"CREATE OR REPLACE TEMP TABLE base AS SELECT {_rounded_select(typed_columns, rounding)} "
+        f"FROM (SELECT {_typed_select(base_columns, names, types)} FROM {source})"
+    )
+    return names
+
+
+def _compare_table(
+    warehouse: Warehouse,
+    config: PipelineConfig,
+    context: RunContext,
+    table: str,
+    logger,
+) -> Dict:
+    baseline_path = _baseline_path(Path(config.compare.baseline_dir), table)
+    entry = {
+        "table": table,
+        "baseline_path": str(baseline_path),
+        "baseline_exists": baseline_path.exists(),
+    }
+    if not baseline_path.exists():
+        return entry
+
+    source_path = baseline_path
+    if config.compare.snapshot_cache:
+        source_path = _baseline_snapshot(baseline_path, context.data_dir / "compare_cache")
+
+    # Each table runs on its own cursor, so the temp objects below never collide.
+    with warehouse.connect() as con:
+        names = _materialize_sides(con, table, source_path, config.compare.rounding)
+        entry.update(
+            diff_tables(
+                con,
+                "base",
+                "curr",
+                names,
+                config.compare.keys.get(table),
+                config.compare.max_samples,
+            )
+        )
+        con.execute("DROP TABLE base")
+        con.execute("DROP VIEW curr")
+
+    logger.info(
+        "Compare %s missing=%s extra=%s changed=%s",
+        table,
+        entry["missing_rows"],
+        entry["extra_rows"],
+        entry.get("changed_rows", "-"),
+    )
+    return entry
+
+
 @dataclass
 class CompareResult:
     table_stats: Dict[str, dict]
     report_path: Path
 
 
-def run_compare(config: PipelineConfig, context: RunContext, logger) -> CompareResult:
-    baseline_dir = Path(config.compare.baseline_dir)
+def run_compare(
+    config: PipelineConfig,
+    context: RunContext,
+    logger,
+    warehouse: Optional[Warehouse] = None,
+) -> CompareResult:
     report = {
         "run_id": context.run_id,
         "run_date": context.run_date.strftime("%Y-%m-%d"),
         "tables": [],
     }
 
-    with duckdb.connect(str(context.warehouse_path)) as con:
-        for output in config.feishu.outputs:
-            table = output.table
-            baseline_path = _baseline_path(baseline_dir, table)
-            entry = {
-                "table": table,
-                "baseline_path": str(baseline_path),
-                "baseline_exists": baseline_path.exists(),
-            }
-            if not baseline_path.exists():
-                report["tables"].append(entry)
-                continue
-
-            select_curr = _select_with_rounding(con, table, config.compare.rounding)
-            select_base = select_curr
-
-            con.execute("DROP VIEW IF EXISTS curr")
-            con.execute("DROP VIEW IF EXISTS base")
-            con.execute(
-                f"CREATE TEMP VIEW curr AS SELECT {select_curr} FROM {table}"
-            )
-            con.execute(
-                "CREATE TEMP VIEW base AS SELECT * FROM read_csv_auto(?)",
-                [str(baseline_path)],
-            )
-
-            missing = con.execute("SELECT COUNT(*) FROM (SELECT * FROM base EXCEPT SELECT * FROM curr)").fetchone()[0]
-            extra = con.execute("SELECT COUNT(*) FROM (SELECT * FROM curr EXCEPT SELECT * FROM base)").fetchone()[0]
-            entry["missing_rows"] = missing
-            entry["extra_rows"] = extra
-
-            sample_missing = _fetch_records(
-                con,
-                "SELECT * FROM base EXCEPT SELECT * FROM curr LIMIT ?",
-                [config.compare.max_samples],
-            )
-            sample_extra = _fetch_records(
-                con,
-                "SELECT * FROM curr EXCEPT SELECT * FROM base LIMIT ?",
-                [config.compare.max_samples],
-            )
-            entry["sample_missing"] = sample_missing
-            entry["sample_extra"] = sample_extra
-
-            report["tables"].append(entry)
-            logger.info("Compare %s missing=%s extra=%s", table, missing, extra)
+    warehouse = warehouse or Warehouse(context.warehouse_path)
+    tables = [output.table for output in config.feishu.outputs]
+    with warehouse.session(), ThreadPoolExecutor(max_workers=config.compare.concurrency) as pool:
+        futures = [pool.submit(_compare_table, warehouse, config, context, table, logger) for table in tables]
+        try:
+            report["tables"] = [future.result() for future in futures]
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
 
     report_path = context.report_dir / f"compare_{context.run_date.strftime('%Y-%m-%d')}.json"
     write_json(report_path, report)
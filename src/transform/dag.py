@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import re
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, TypeVar
+
+
+T = TypeVar("T")
+
+TABLE_REF_RE = re.compile(r'\b(raw|dim|mart)\s*\.\s*("(?:[^"]|"")+"|[A-Za-z_][A-Za-z0-9_]*)', re.IGNORECASE)
+LINE_COMMENT_RE = re.compile(r"--[^\n]*")
+BLOCK_COMMENT_RE = re.compile(r"/\*.*?\*/", re.DOTALL)
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+MATERIALIZED_RE = re.compile(r"^--\s*materialized\s*:\s*(\S+)\s*$", re.IGNORECASE)
+
+MATERIALIZATIONS = ("table", "incremental", "view")
+
+
+@dataclass
+class TransformModel:
+    name: str
+    path: Path
+    sql: str
+    materialized: Optional[str] = None
+    refs: Set[str] = field(default_factory=set)
+    depends_on: Set[str] = field(default_factory=set)
+
+
+def parse_materialization(sql: str) -> Optional[str]:
+    # Only the leading comment block is considered a header.
+    for line in sql.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if not line.startswith("--"):
+            break
+        match = MATERIALIZED_RE.match(line)
+        if match:
+            value = match.group(1).lower()
+            if value not in MATERIALIZATIONS:
+                raise ValueError(f"Unsupported materialization: {match.group(1)}")
+            return value
+    return None
+
+
+def table_refs(sql: str) -> Set[str]:
+    text = BLOCK_COMMENT_RE.sub(" ", LINE_COMMENT_RE.sub(" ", sql))
+    text = STRING_RE.sub("''", text)
+    refs: Set[str] = set()
+    for schema, name in TABLE_REF_RE.findall(text):
+        if name.startswith('"'):
+            name = name[1:-1].replace('""', '"')
+        else:
+            name = name.lower()
+        refs.add(f"{schema.lower()}.{name}")
+    return refs
+
+
+def build_models(sql_files: Iterable[Path]) -> List[TransformModel]:
+    models = []
+    for sql_file in sorted(sql_files):
+        sql = sql_file.read_text(encoding="utf-8")
+        try:
+            materialized = parse_materialization(sql)
+        except ValueError as exc:
+            raise ValueError(f"{sql_file}: {exc}") from exc
+        models.append(
+            TransformModel(
+                name=f"mart.{sql_file.stem}",
+                path=sql_file,
+                sql=sql,
+                materialized=materialized,
+                refs=table_refs(sql),
+            )
+        )
+    names = {model.name for model in models}
+    for model in models:
+        # mart tables without a model file are treated as external inputs.
+        model.depends_on = {ref for ref in model.refs if ref in names and ref != model.name}
+    check_acyclic(models)
+    return models
+
+
+def check_acyclic(models: List[TransformModel]) -> None:
+    remaining = {model.name: set(model.depends_on) for model in models}
+    while remaining:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            cycle = ", ".join(sorted(remaining))
+            raise ValueError(f"Dependency cycle between transform models: {cycle}")
+        for name in ready:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+
+
+def run_models(models: List[TransformModel], run: Callable[[TransformModel], T], max_workers: int) -> Dict[str, T]:
+    # Runs each model once all of its dependencies finished. Ready models are started
+    # in file order; the first failure stops new submissions and is re-raised.
+    results: Dict[str, T] = {}
+    pending = {model.name: set(model.depends_on) for model in models}
+    by_name = {model.name: model for model in models}
+    running: Dict[Future, str] = {}
+    error: BaseException | None = None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while True:
+            if error is None:
+                for name in [name for name, deps in pending.items() if not deps]:
+                    del pending[name]
+                    running[pool.submit(run, by_name[name])] = name
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except BaseException as exc:
+                    if error is None:
+                        error = exc
+                    continue
+                for deps in pending.values():
+                    deps.discard(name)
+
+    if error is not None:
+        raise error
+    return {model.name: results[model.name] for model in models}
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Sequence
+
+import duckdb
+
+from ..storage.warehouse import quote_ident
+
+
+def _hash_sql(columns: Sequence[str]) -> str:
+    return "hash(" + ", ".join(quote_ident(c) for c in columns) + ")"
+
+
+def _fetch_by_hash(
+    con: duckdb.DuckDBPyConnection,
+    relation: str,
+    hash_sql: str,
+    hashes: List[int],
+    limit: int,
+) -> List[dict]:
+    if not hashes:
+        return []
+    cursor = con.execute(
+        f"SELECT * FROM {relation} WHERE {hash_sql} IN (SELECT UNNEST(?::UBIGINT[])) LIMIT ?",
+        [hashes, limit],
+    )
+    cols = [desc[0] for desc in cursor.description]
+    return [dict(zip(cols, row)) for row in cursor.fetchall()]
+
+
+def _diff_rows(
+    con: duckdb.DuckDBPyConnection,
+    base: str,
+    curr: str,
+    columns: List[str],
+    max_samples: int,
+) -> Dict:
+    # Set semantics, like the previous EXCEPT queries: duplicate rows count once. Both
+    # sides are tagged and aggregated in one pass; side 1 = baseline only, 2 = current only.
+    row_hash = _hash_sql(columns)
+    limit = int(max_samples)
+    missing, extra, missing_hashes, extra_hashes = con.execute(
+        f"""
+        SELECT
+            COUNT(*) FILTER (WHERE sides = 1),
+            COUNT(*) FILTER (WHERE sides = 2),
+            min(h, {limit}) FILTER (WHERE sides = 1),
+            min(h, {limit}) FILTER (WHERE sides = 2)
+        FROM (
+            SELECT h, bit_or(side) AS sides
+            FROM (
+                SELECT {row_hash} AS h, 1::UTINYINT AS side FROM {base}
+                UNION ALL
+                SELECT {row_hash} AS h, 2::UTINYINT AS side FROM {curr}
+            )
+            GROUP BY h
+        )
+        """
+    ).fetchone()
+    return {
+        "missing_rows": missing,
+        "extra_rows": extra,
+        "sample_missing": _fetch_by_hash(con, base, row_hash, missing_hashes or [], max_samples),
+        "sample_extra": _fetch_by_hash(con, curr, row_hash, extra_hashes or [], max_samples),
+    }
+
+
+def _cell_diffs(
+    con: duckdb.DuckDBPyConnection,
+    base: str,
+    curr: str,
+    key_hash: str,
+    keys: List[str],
+    columns: List[str],
+    hashes: List[int],
+) -> List[Dict]:
+    base_rows = {}
+    for row in _fetch_by_hash(con, f"(SELECT {key_hash} AS __key, * FROM {base})", key_hash, hashes, len(hashes) * 2):
+        base_rows.setdefault(row.pop("__key"), row)
+    diffs: List[Dict] = []
+    seen = set()
+    for row in _fetch_by_hash(con, f"(SELECT {key_hash} AS __key, * FROM {curr})", key_hash, hashes, len(hashes) * 2):
+        key = row.pop("__key")
+        if key in seen or key not in base_rows:
+            continue
+        seen.add(key)
+        before = base_rows[key]
+        cells = {
+            column: {"baseline": before[column], "current": row[column]}
+            for column in columns
+            if column not in keys and before[column] != row[column]
+        }
+        diffs.append({"key": {k: row[k] for k in keys}, "cells": cells})
+    return diffs
+
+
+def _diff_keyed(
+    con: duckdb.DuckDBPyConnection,
+    base: str,
+    curr: str,
+    columns: List[str],
+    keys: List[str],
+    max_samples: int,
+) -> Dict:
+    unknown = [k for k in keys if k not in columns]
+    if unknown:
+        raise ValueError(f"Compare keys not found in table: {unknown}")
+    key_hash = _hash_sql(keys)
+    row_hash = _hash_sql(columns)
+    # Rows are folded per key (sum of row hashes plus a count), so duplicated keys still
+    # compare deterministically.
+    per_key = "SELECT {k} AS k, SUM({h}::HUGEINT) AS h, COUNT(*) AS n FROM {rel} GROUP BY k"
+    limit = int(max_samples)
+    row = con.execute(
+        f"""
+        WITH b AS ({per_key.format(k=key_hash, h=row_hash, rel=base)}),
+             c AS ({per_key.format(k=key_hash, h=row_hash, rel=curr)})
+        SELECT
+            COUNT(*) FILTER (WHERE c.k IS NULL),
+            COUNT(*) FILTER (WHERE b.k IS NULL),
+            COUNT(*) FILTER (WHERE b.k = c.k AND (b.h <> c.h OR b.n <> c.n)),
+            COUNT(*) FILTER (WHERE b.n > 1 OR c.n > 1),
+            min(b.k, {limit}) FILTER (WHERE c.k IS NULL),
+            min(c.k, {limit}) FILTER (WHERE b.k IS NULL),
+            min(b.k, {limit}) FILTER (WHERE b.k = c.k AND (b.h <> c.h OR b.n <> c.n))
+        FROM b FULL OUTER JOIN c ON b.k = c.k
+        """
+    ).fetchone()
+    missing, extra, changed, duplicate_keys, missing_keys, extra_keys, changed_keys = row
+    return {
+        "keys": keys,
+        "missing_rows": missing,
+        "extra_rows": extra,
+        "changed_rows": changed,
+        "duplicate_keys": duplicate_keys,
+        "sample_missing": _fetch_by_hash(con, base, key_hash, missing_keys or [], max_samples),
+        "sample_extra": _fetch_by_hash(con, curr, key_hash, extra_keys or [], max_samples),
+        "sample_changed": _cell_diffs(con, base, curr, key_hash, keys, columns, changed_keys or []),
+    }
+
+
+def diff_tables(
+    con: duckdb.DuckDBPyConnection,
+    base: str,
+    curr: str,
+    columns: List[str],
+    keys: Optional[List[str]],
+    max_samples: int,
+) -> Dict:
+    if keys:
+        return _diff_keyed(con, base, curr, columns, keys, max_samples)
+    return _diff_rows(con, base, curr, columns, max_samples)
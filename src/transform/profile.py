@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+import duckdb
+
+
+PROFILING_METRICS = (
+    "LATENCY",
+    "CPU_TIME",
+    "ROWS_RETURNED",
+    "CUMULATIVE_ROWS_SCANNED",
+    "SYSTEM_PEAK_BUFFER_MEMORY",
+    "OPERATOR_TYPE",
+    "OPERATOR_TIMING",
+    "OPERATOR_CARDINALITY",
+    "OPERATOR_ROWS_SCANNED",
+    "EXTRA_INFO",
+)
+
+
+@dataclass
+class ModelProfile:
+    wall_seconds: float
+    latency: float
+    cpu_time: float
+    peak_memory_bytes: int
+    rows_scanned: int
+    rows_returned: int
+    operators: List[Dict] = field(default_factory=list)
+    plan: str = ""
+
+
+def enable_profiling(con: duckdb.DuckDBPyConnection) -> None:
+    # Profiles are kept in memory per cursor and read back with get_profiling_information.
+    settings = json.dumps({metric: "true" for metric in PROFILING_METRICS})
+    con.execute("SET enable_profiling = 'no_output'")
+    con.execute(f"SET custom_profiling_settings = '{settings}'")
+
+
+def disable_profiling(con: duckdb.DuckDBPyConnection) -> None:
+    con.execute("RESET enable_profiling")
+
+
+def _flatten_operators(node: Dict, depth: int, operators: List[Dict]) -> None:
+    for child in node.get("children", []):
+        operators.append(
+            {
+                "operator_name": child.get("operator_name") or child.get("operator_type"),
+                "depth": depth,
+                "timing": float(child.get("operator_timing") or 0.0),
+                "cardinality": int(child.get("operator_cardinality") or 0),
+                "rows_scanned": int(child.get("operator_rows_scanned") or 0),
+            }
+        )
+        _flatten_operators(child, depth + 1, operators)
+
+
+def read_profile(con: duckdb.DuckDBPyConnection, wall_seconds: float) -> ModelProfile:
+    # Describes the last statement executed on the cursor.
+    plan = con.get_profiling_information(format="json")
+    root = json.loads(plan)
+    operators: List[Dict] = []
+    _flatten_operators(root, 0, operators)
+    return ModelProfile(
+        wall_seconds=wall_seconds,
+        latency=float(root.get("latency") or 0.0),
+        cpu_time=float(root.get("cpu_time") or 0.0),
+        peak_memory_bytes=int(root.get("system_peak_buffer_memory") or 0),
+        rows_scanned=int(root.get("cumulative_rows_scanned") or 0),
+        rows_returned=int(root.get("rows_returned") or 0),
+        operators=operators,
+        plan=plan,
+    )
+
+
+def format_transform_stats(models: List[tuple], operators: List[tuple]) -> str:
+    lines = ["Slowest models (avg/max wall seconds, avg peak MiB, runs):"]
+    for model_name, avg_wall, max_wall, avg_memory, runs in models:
+        lines.append(f"  {model_name:<40} {avg_wall:>9.3f} {max_wall:>9.3f} {avg_memory / 1048576:>9.1f} {runs:>5}")
+    lines.append("Slowest operators (model, operator, avg/max seconds, avg rows):")
+    for model_name, operator_name, avg_timing, max_timing, avg_rows in operators:
+        lines.append(
+            f"  {model_name:<40} {operator_name:<28} {avg_timing:>9.3f} {max_timing:>9.3f} {avg_rows:>12.0f}"
+        )
+    return "\n".join(lines)
@@ -1,12 +1,15 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import time
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict
-
-import duckdb
+from typing import Callable, Dict, List, Optional, Tuple
 
 from ..core.context import RunContext
+from ..storage import Warehouse
+from .cache import model_fingerprint, partition_key
+from .dag import TransformModel, build_models, run_models
+from .profile import ModelProfile, disable_profiling, enable_profiling, read_profile
 
 
 def render_sql(sql_text: str, run_date: str) -> str:
@@ -16,23 +19,121 @@ def render_sql(sql_text: str, run_date: str) -> str:
 @dataclass
 class TransformResult:
     table_rows: Dict[str, int]
+    cached: List[str] = field(default_factory=list)
+
+
+def _strip_statement(sql: str) -> str:
+    return sql.strip().rstrip(";").strip()
+
+
+def _materialize(
+    con,
+    model: TransformModel,
+    rendered: str,
+    run_date: str,
+    after_main: Optional[Callable[[object], None]] = None,
+) -> int:
+    # after_main runs right after the statement that builds the model, before the
+    # bookkeeping queries, so profiling captures the model's own plan.
+    after_main = after_main or (lambda _: None)
+    if model.materialized is None:
+        con.execute(rendered)
+        after_main(con)
+        return con.execute(f"SELECT COUNT(*) FROM {model.name}").fetchone()[0]
+
+    select_sql = _strip_statement(rendered)
+    if model.materialized == "view":
+        con.execute(f"CREATE OR REPLACE VIEW {model.name} AS {select_sql}")
+        after_main(con)
+        return con.execute(f"SELECT COUNT(*) FROM {model.name}").fetchone()[0]
+    if model.materialized == "table":
+        con.execute(f"CREATE OR REPLACE TABLE {model.name} AS {select_sql}")
+        after_main(con)
+        return con.execute(f"SELECT COUNT(*) FROM {model.name}").fetchone()[0]
+
+    # incremental: only the run_date partition is replaced.
+    con.execute(f"CREATE TABLE IF NOT EXISTS {model.name} AS SELECT * FROM ({select_sql}\n) LIMIT 0")
+    columns = {row[0] for row in con.execute(f"DESCRIBE {model.name}").fetchall()}
+    if "run_date" not in columns:
+        raise ValueError(f"Incremental model {model.name} must select a run_date column")
+    con.execute("BEGIN TRANSACTION")
+    try:
+        con.execute(f"DELETE FROM {model.name} WHERE run_date = DATE '{run_date}'")
+        con.execute(f"INSERT INTO {model.name} BY NAME SELECT * FROM ({select_sql}\n) WHERE run_date = DATE '{run_date}'")
+        after_main(con)
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    return con.execute(f"SELECT COUNT(*) FROM {model.name} WHERE run_date = DATE '{run_date}'").fetchone()[0]
+
+
+def _run_model(
+    warehouse: Warehouse,
+    model: TransformModel,
+    run_date: str,
+    logger,
+    use_cache: bool,
+    profile: bool,
+    run_id: str,
+) -> Tuple[int, bool]:
+    rendered = render_sql(model.sql, run_date)
+    partition = partition_key(model, run_date)
+    # The fingerprint is kept up to date even with the cache off, so turning it on
+    # later never matches a table that was rebuilt from different inputs.
+    fingerprint = model_fingerprint(warehouse, model, rendered)
+    if use_cache and fingerprint is not None:
+        cached = warehouse.get_transform_cache(model.name, partition)
+        if cached and cached[0] == fingerprint and warehouse.table_exists(model.name):
+            logger.info("Skipped %s, inputs unchanged (%s rows)", model.name, cached[1])
+            return cached[1], True
+
+    profiles: List[ModelProfile] = []
+    start = time.perf_counter()
+    with warehouse.connect() as con:
+        if profile:
+            enable_profiling(con)
+            row_count = _materialize(
+                con,
+                model,
+                rendered,
+                run_date,
+                lambda cursor: profiles.append(read_profile(cursor, time.perf_counter() - start)),
+            )
+            disable_profiling(con)
+        else:
+            row_count = _materialize(con, model, rendered, run_date)
+    if profiles:
+        warehouse.record_transform_profile(run_id, run_date, model.name, profiles[0])
+    warehouse.record_transform_cache(model.name, partition, fingerprint, row_count)
+    logger.info("Transformed %s rows into %s (%s)", row_count, model.name, model.materialized or "script")
+    return row_count, False
 
 
-def run_transform(context: RunContext, sql_dir: Path, logger) -> TransformResult:
+def run_transform(
+    context: RunContext,
+    sql_dir: Path,
+    logger,
+    warehouse: Optional[Warehouse] = None,
+    concurrency: int = 1,
+    use_cache: bool = False,
+    profile: bool = False,
+) -> TransformResult:
     run_date = context.run_date.strftime("%Y-%m-%d")
     sql_files = sorted(sql_dir.glob("*.sql"))
     if not sql_files:
         raise FileNotFoundError(f"No SQL files found in {sql_dir}")
+    models = build_models(sql_files)
 
-    table_rows: Dict[str, int] = {}
-    with duckdb.connect(str(context.warehouse_path)) as con:
-        con.execute("CREATE SCHEMA IF NOT EXISTS mart")
-        for sql_file in sql_files:
-            sql_text = sql_file.read_text(encoding="utf-8")
-            rendered = render_sql(sql_text, run_date)
-            con.execute(rendered)
-            table_name = f"mart.{sql_file.stem}"
-            row_count = con.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
-            table_rows[table_name] = row_count
-            logger.info("Transformed %s rows into %s", row_count, table_name)
-    return TransformResult(table_rows=table_rows)
+    warehouse = warehouse or Warehouse(context.warehouse_path)
+    with warehouse.session():
+        warehouse.init()
+        results = run_models(
+            models,
+            lambda model: _run_model(warehouse, model, run_date, logger, use_cache, profile, context.run_id),
+            max_workers=concurrency,
+        )
+    return TransformResult(
+        table_rows={name: rows for name, (rows, _) in results.items()},
+        cached=[name for name, (_, cached) in results.items() if cached],
+    )
@@ -1,5 +1,6 @@
 from .dates import parse_date, today, yesterday, to_datestr
 from .fs import ensure_dir, sha256_file, write_json
+from .ratelimit import TokenBucket
 from .retry import create_retry_session
 
 __all__ = [
@@ -11,4 +12,5 @@ __all__ = [
     "sha256_file",
     "write_json",
     "create_retry_session",
+    "TokenBucket",
 ]
\ No newline at end of file
@@ -2,18 +2,307 @@ from __future__ import annotations
 
 import csv
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, Iterator, List, Optional, Tuple
+from warnings import warn
+from xml.parsers import expat
 
 import openpyxl
+from openpyxl.reader.excel import ExcelReader
+from openpyxl.styles.stylesheet import apply_stylesheet
+from openpyxl.utils.cell import coordinate_to_tuple, range_boundaries
+from openpyxl.utils.datetime import from_excel, from_ISO8601
+from openpyxl.xml.constants import SHEET_MAIN_NS
 
 
-def xlsx_to_csv(source_path: Path, output_path: Path, sheet_name: Optional[str] = None) -> None:
+XLSX_ENGINES = ("auto", "stream", "openpyxl")
+
+_READ_CHUNK = 1024 * 1024
+_ROW_TAG = f"{SHEET_MAIN_NS} row"
+_CELL_TAG = f"{SHEET_MAIN_NS} c"
+_VALUE_TAG = f"{SHEET_MAIN_NS} v"
+_INLINE_TAG = f"{SHEET_MAIN_NS} is"
+_TEXT_TAG = f"{SHEET_MAIN_NS} t"
+_PHONETIC_TAG = f"{SHEET_MAIN_NS} rPh"
+_DIMENSION_TAG = f"{SHEET_MAIN_NS} dimension"
+_SHEET_DATA_TAG = f"{SHEET_MAIN_NS} sheetData"
+
+
+def _cast_number(value: str):
+    if "." in value or "E" in value or "e" in value:
+        return float(value)
+    return int(value)
+
+
+_COLUMN_CACHE: dict = {}
+
+
+def _column_index(coordinate: str) -> int:
+    letters = coordinate.rstrip("0123456789")
+    column = _COLUMN_CACHE.get(letters)
+    if column is None:
+        column = coordinate_to_tuple(coordinate)[1]
+        _COLUMN_CACHE[letters] = column
+    return column
+
+
+class _SheetRowParser:
+    # Mirrors openpyxl's WorkSheetParser.parse_row/parse_cell with data_only=True,
+    # but drives expat directly and only keeps (column, value) pairs per row.
+
+    def __init__(self, shared_strings, date_formats, timedelta_formats, epoch) -> None:
+        self.shared_strings = shared_strings
+        self.date_formats = date_formats
+        self.timedelta_formats = timedelta_formats
+        self.epoch = epoch
+        self.rows: List[Tuple[int, List[Tuple[int, object]]]] = []
+        self.row_counter = 0
+        self.col_counter = 0
+        self._cells: List[Tuple[int, object]] = []
+        self._in_cell = False
+        self._coordinate: Optional[str] = None
+        self._data_type = "n"
+        self._style_id = 0
+        self._value: Optional[str] = None
+        self._text: Optional[List[str]] = None
+        self._inline: Optional[List[str]] = None
+        self._in_phonetic = False
+
+    def start(self, tag: str, attrs: dict) -> None:
+        if tag == _CELL_TAG:
+            self._start_cell(attrs)
+        elif tag == _ROW_TAG:
+            self._start_row(attrs)
+        elif not self._in_cell:
+            return
+        elif tag == _VALUE_TAG:
+            if self._inline is None and self._value is None:
+                self._text = []
+        elif tag == _INLINE_TAG:
+            if self._inline is None:
+                self._inline = []
+        elif tag == _TEXT_TAG:
+            if self._inline is not None and not self._in_phonetic:
+                self._text = []
+        elif tag == _PHONETIC_TAG:
+            self._in_phonetic = True
+
+    def end(self, tag: str) -> None:
+        if tag == _CELL_TAG:
+            self._end_cell()
+        elif tag == _ROW_TAG:
+            self.rows.append((self.row_counter, self._cells))
+            self._cells = []
+        elif self._text is None:
+            if tag == _PHONETIC_TAG:
+                self._in_phonetic = False
+        elif tag == _VALUE_TAG:
+            self._value = "".join(self._text)
+            self._text = None
+        elif tag == _TEXT_TAG:
+            self._inline.append("".join(self._text))
+            self._text = None
+
+    def data(self, text: str) -> None:
+        if self._text is not None:
+            self._text.append(text)
+
+    def _start_row(self, attrs: dict) -> None:
+        if "r" in attrs:
+            try:
+                self.row_counter = int(attrs["r"])
+            except ValueError:
+                val = float(attrs["r"])
+                if not val.is_integer():
+                    raise ValueError(f"{attrs['r']} is not a valid row number")
+                self.row_counter = int(val)
+        else:
+            self.row_counter += 1
+        self.col_counter = 0
+        self._cells = []
+
+    def _start_cell(self, attrs: dict) -> None:
+        coordinate = attrs.get("r")
+        if coordinate:
+            self.col_counter = _column_index(coordinate)
+        else:
+            self.col_counter += 1
+        style_id = attrs.get("s", 0)
+        if style_id:
+            style_id = int(style_id)
+        self._in_cell = True
+        self._coordinate = coordinate
+        self._data_type = attrs.get("t", "n")
+        self._style_id = style_id
+        self._value = None
+        self._inline = None
+        self._in_phonetic = False
+
+    def _end_cell(self) -> None:
+        data_type = self._data_type
+        value = None if data_type == "inlineStr" else (self._value or None)
+        if value is not None:
+            if data_type == "n":
+                value = _cast_number(value)
+                if self._style_id in self.date_formats:
+                    try:
+                        value = from_excel(value, self.epoch, timedelta=self._style_id in self.timedelta_formats)
+                    except (OverflowError, ValueError):
+                        warn(
+                            f"Cell {self._coordinate} is marked as a date but the serial value {value} "
+                            "is outside the limits for dates. The cell will be treated as an error."
+                        )
+                        value = "#VALUE!"
+            elif data_type == "s":
+                value = self.shared_strings[int(value)]
+            elif data_type == "b":
+                value = bool(int(value))
+            elif data_type == "d":
+                value = from_ISO8601(value)
+        elif data_type == "inlineStr" and self._inline is not None:
+            value = "".join(self._inline)
+        self._cells.append((self.col_counter, value))
+        self._in_cell = False
+        self._inline = None
+        self._text = None
+
+    def parse(self, source) -> Iterator[Tuple[int, List[Tuple[int, object]]]]:
+        parser = expat.ParserCreate(namespace_separator=" ")
+        parser.buffer_text = True
+        parser.StartElementHandler = self.start
+        parser.EndElementHandler = self.end
+        parser.CharacterDataHandler = self.data
+        while True:
+            chunk = source.read(_READ_CHUNK)
+            parser.Parse(chunk, not chunk)
+            if self.rows:
+                yield from self.rows
+                self.rows = []
+            if not chunk:
+                break
+
+
+class _DimensionFound(Exception):
+    pass
+
+
+def _read_dimensions(source) -> Optional[Tuple[int, int, int, int]]:
+    # Like WorkSheetParser.parse_dimensions, but stops as soon as <sheetData> starts
+    # instead of scanning to its end when the sheet has no <dimension> element.
+    found: List[Tuple[int, int, int, int]] = []
+
+    def start(tag: str, attrs: dict) -> None:
+        if tag == _DIMENSION_TAG:
+            found.append(range_boundaries(attrs["ref"]))
+            raise _DimensionFound
+        if tag == _SHEET_DATA_TAG:
+            raise _DimensionFound
+
+    parser = expat.ParserCreate(namespace_separator=" ")
+    parser.StartElementHandler = start
+    try:
+        while True:
+            chunk = source.read(64 * 1024)
+            parser.Parse(chunk, not chunk)
+            if not chunk:
+                break
+    except _DimensionFound:
+        pass
+    return found[0] if found else None
+
+
+def _find_sheet_path(reader: ExcelReader, sheet_name: Optional[str]) -> str:
+    for sheet, rel in reader.parser.find_sheets():
+        if rel.target not in reader.valid_files or "chartsheet" in rel.Type:
+            continue
+        if sheet_name is None or sheet.name == sheet_name:
+            return rel.target
+    if sheet_name is None:
+        raise IndexError("Workbook has no worksheets")
+    raise KeyError(f"Worksheet {sheet_name} does not exist.")
+
+
+def _stream_rows(reader: ExcelReader, sheet_path: str) -> Iterator[tuple]:
+    # Same row/column padding rules as ReadOnlyWorksheet._cells_by_row(values_only=True).
+    with reader.archive.open(sheet_path) as source:
+        dimensions = _read_dimensions(source)
+    max_col = max_row = None
+    if dimensions is not None:
+        _, _, max_col, max_row = dimensions
+
+    min_col = 1
+    empty_row: tuple = ()
+    if max_col is not None:
+        empty_row = (None,) * (max_col + 1 - min_col)
+
+    wb = reader.wb
+    parser = _SheetRowParser(reader.shared_strings, wb._date_formats, wb._timedelta_formats, wb.epoch)
+    counter = 1
+    idx = 1
+    with reader.archive.open(sheet_path) as source:
+        for idx, cells in parser.parse(source):
+            if max_row is not None and idx > max_row:
+                break
+            for _ in range(counter, idx):
+                counter += 1
+                yield empty_row
+            if counter <= idx:
+                counter += 1
+                if not cells and not max_col:
+                    yield ()
+                    continue
+                row_max = max_col or cells[-1][0]
+                row = [None] * (row_max + 1 - min_col)
+                for column, value in cells:
+                    if min_col <= column <= row_max:
+                        row[column - min_col] = value
+                yield tuple(row)
+
+    if max_row is not None and max_row < idx:
+        for _ in range(counter, max_row + 1):
+            yield empty_row
+
+
+def _open_reader(source_path: Path) -> ExcelReader:
+    # The workbook-level parts (shared strings, styles, epoch) come from openpyxl so
+    # values are decoded exactly as the openpyxl engine would; only sheets are skipped.
+    reader = ExcelReader(source_path, read_only=True, data_only=True)
+    reader.read_manifest()
+    reader.read_strings()
+    reader.read_workbook()
+    apply_stylesheet(reader.archive, reader.wb)
+    return reader
+
+
+def xlsx_to_csv(
+    source_path: Path,
+    output_path: Path,
+    sheet_name: Optional[str] = None,
+    engine: str = "openpyxl",
+) -> None:
+    if engine not in XLSX_ENGINES:
+        raise ValueError(f"Unsupported xlsx engine: {engine}")
+    if engine in {"auto", "stream"}:
+        try:
+            reader = _open_reader(source_path)
+            try:
+                rows = _stream_rows(reader, _find_sheet_path(reader, sheet_name))
+                _write_csv(output_path, rows)
+            finally:
+                reader.archive.close()
+            return
+        except Exception:
+            # "auto" retries with openpyxl, which rewrites the output from scratch.
+            if engine == "stream":
+                raise
+
     wb = openpyxl.load_workbook(source_path, read_only=True, data_only=True)
-    ws = wb[sheet_name] if sheet_name else wb.worksheets[0]
+    try:
+        ws = wb[sheet_name] if sheet_name else wb.worksheets[0]
+        _write_csv(output_path, ws.iter_rows(values_only=True))
+    finally:
+        wb.close()
 
-    with output_path.open("w", encoding="utf-8", newline="") as handle:
-        writer = csv.writer(handle)
-        for row in ws.iter_rows(values_only=True):
-            writer.writerow(list(row))
 
-    wb.close()
+def _write_csv(output_path: Path, rows: Iterable[tuple]) -> None:
+    with output_path.open("w", encoding="utf-8", newline="") as handle:
+        csv.writer(handle).writerows(rows)
@@ -5,18 +5,26 @@ from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
 
-def create_retry_session(total_retries: int, backoff_factor: float = 0.5) -> requests.Session:
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def create_retry_session(
+    total_retries: int,
+    backoff_factor: float = 0.5,
+    pool_maxsize: int = 10,
+    statuses: tuple = RETRY_STATUSES,
+) -> requests.Session:
     retry = Retry(
         total=total_retries,
         connect=total_retries,
         read=total_retries,
         status=total_retries,
-        status_forcelist=(429, 500, 502, 503, 504),
+        status_forcelist=statuses,
         allowed_methods=("HEAD", "GET", "POST", "PUT", "DELETE", "PATCH"),
         backoff_factor=backoff_factor,
         raise_on_status=False,
     )
-    adapter = HTTPAdapter(max_retries=retry)
+    adapter = HTTPAdapter(max_retries=retry, pool_maxsize=pool_maxsize)
     session = requests.Session()
     session.mount("http://", adapter)
     session.mount("https://", adapter)
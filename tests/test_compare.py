@@ -0,0 +1,70 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import duckdb
+
+from src.transform.compare import _baseline_snapshot, _materialize_sides
+from src.transform.diff import diff_tables
+
+
+def _tables():
+    con = duckdb.connect()
+    con.execute("CREATE TABLE base AS SELECT * FROM (VALUES (1, 'a', 1.0), (2, 'b', 2.0), (3, 'c', 3.0)) t(id, name, amt)")
+    con.execute("CREATE TABLE curr AS SELECT * FROM (VALUES (1, 'a', 1.0), (2, 'b', 2.5), (4, 'd', 4.0)) t(id, name, amt)")
+    return con
+
+
+def test_row_diff_matches_except_semantics():
+    con = _tables()
+    result = diff_tables(con, "base", "curr", ["id", "name", "amt"], None, max_samples=10)
+    assert result["missing_rows"] == 2
+    assert result["extra_rows"] == 2
+    assert sorted(row["id"] for row in result["sample_missing"]) == [2, 3]
+    assert sorted(row["id"] for row in result["sample_extra"]) == [2, 4]
+
+
+def test_keyed_diff_reports_changed_cells():
+    con = _tables()
+    result = diff_tables(con, "base", "curr", ["id", "name", "amt"], ["id"], max_samples=10)
+    assert (result["missing_rows"], result["extra_rows"], result["changed_rows"]) == (1, 1, 1)
+    assert [row["id"] for row in result["sample_missing"]] == [3]
+    assert [row["id"] for row in result["sample_extra"]] == [4]
+    assert result["sample_changed"] == [{"key": {"id": 2}, "cells": {"amt": {"baseline": 2.0, "current": 2.5}}}]
+
+
+def test_baseline_snapshot_is_keyed_by_content(tmp_path):
+    baseline = tmp_path / "mart.region.csv"
+    cache_dir = tmp_path / "cache"
+    baseline.write_text("id,amt\n1,1.5\n", encoding="utf-8")
+    first = _baseline_snapshot(baseline, cache_dir)
+    assert _baseline_snapshot(baseline, cache_dir) == first
+
+    baseline.write_text("id,amt\n1,2.5\n", encoding="utf-8")
+    second = _baseline_snapshot(baseline, cache_dir)
+    assert second != first
+    assert list(cache_dir.glob("*.parquet")) == [second]
+    assert duckdb.sql(f"SELECT amt FROM read_parquet('{second}')").fetchall() == [(2.5,)]
+
+
+def test_concurrent_baseline_snapshots_do_not_share_a_temp_file(tmp_path):
+    baseline = tmp_path / "mart.region.csv"
+    cache_dir = tmp_path / "cache"
+    baseline.write_text("id,amt\n" + "".join(f"{i},{i}.5\n" for i in range(20000)), encoding="utf-8")
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        snapshots = set(pool.map(lambda _: _baseline_snapshot(baseline, cache_dir), range(8)))
+
+    (snapshot,) = snapshots
+    assert sorted(cache_dir.iterdir()) == [snapshot]
+    assert duckdb.sql(f"SELECT COUNT(*), SUM(id) FROM read_parquet('{snapshot}')").fetchall() == [(20000, 199990000)]
+
+
+def test_baseline_types_are_not_coerced_into_current_types(tmp_path):
+    con = duckdb.connect()
+    con.execute("CREATE TABLE curr_table AS SELECT * FROM (VALUES (1, 2, NULL::INTEGER), (2, 3, 7)) t(id, amt, code)")
+    baseline = tmp_path / "mart.curr_table.csv"
+    baseline.write_text("id,amt,code\n1,1.5,N/A\n2,3,7\n", encoding="utf-8")
+
+    names = _materialize_sides(con, "curr_table", baseline, rounding=2)
+    result = diff_tables(con, "base", "curr", names, None, max_samples=10)
+    assert (result["missing_rows"], result["extra_rows"]) == (1, 1)
+    assert result["sample_missing"] == [{"id": 1, "amt": 1.5, "code": "N/A"}]
@@ -0,0 +1,25 @@
+from datetime import date, datetime
+
+import openpyxl
+
+from src.utils.convert import xlsx_to_csv
+
+
+def test_stream_engine_matches_openpyxl(tmp_path):
+    source = tmp_path / "sample.xlsx"
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["id", "name", "amount", "updated_at", "flag", "day"])
+    for i in range(50):
+        ws.append([i, f'store "{i}", x' if i % 5 else None, i * 1.5, datetime(2025, 1, 1, 8, i), i % 2 == 0, date(2025, 1, 2)])
+    ws.cell(row=60, column=8, value="tail")
+    other = wb.create_sheet("other")
+    other["C3"] = 7
+    wb.save(source)
+
+    for sheet_name in (None, "other"):
+        expected = tmp_path / "openpyxl.csv"
+        actual = tmp_path / "stream.csv"
+        xlsx_to_csv(source, expected, sheet_name, engine="openpyxl")
+        xlsx_to_csv(source, actual, sheet_name, engine="stream")
+        assert actual.read_bytes() == expected.read_bytes()
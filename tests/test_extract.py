@@ -0,0 +1,216 @@
+import asyncio
+import functools
+import logging
+import pathlib
+import time
+
+import pytest
+
+from src.config import load_config
+from src.core import RunContext
+from src.extract import runner
+from src.extract.guanbi_async import AsyncGuanbiClient
+from src.extract.polling import PollSchedule
+from src.storage import Warehouse
+from src.utils.dates import parse_date
+
+
+class FakeGuanbiClient:
+    def __init__(self, **kwargs):
+        self.cancelled = False
+
+    def sign_in(self):
+        return "token"
+
+    def create_task(self, chart_id, token, filters, mode, export_format):
+        return f"task-{chart_id}", chart_id
+
+    def poll_task(self, task_id, token, expected_seconds=None, on_running=None):
+        # Finish charts in reverse config order to exercise ordered collection.
+        time.sleep(0.05 if task_id.endswith("0") else 0.01)
+        return "2025-01-01 00:00:00"
+
+    def download_to(self, sink, token, file_name, finished_time, mode, export_format):
+        sink(b"col\n")
+        sink(file_name.encode("utf-8"))
+
+    def cancel(self):
+        self.cancelled = True
+
+
+def test_concurrent_extract_keeps_manifest_order(tmp_path, monkeypatch):
+    config = load_config(pathlib.Path("config/config.json"))
+    config.project.extract_concurrency = 4
+    monkeypatch.setenv(config.bi.username_env, "user")
+    monkeypatch.setenv(config.bi.password_env, "pass")
+    monkeypatch.setattr(runner, "GuanbiClient", FakeGuanbiClient)
+    context = RunContext.create(parse_date("2025-01-01"), tmp_path / "data", tmp_path / "logs")
+
+    result = runner.run_extract(config, context, logging.getLogger("test"))
+
+    chart_ids = [chart.chart_id for chart in config.bi.charts]
+    assert list(result.files) == chart_ids
+    assert all(count == 1 for count in result.row_counts.values())
+    raw_files = list(context.raw_dir.glob("chart_id=*/*"))
+    assert sorted(path.name for path in raw_files) == ["data.csv"] * len(chart_ids)
+    # Raw files get the same permissions as a plain write, not mkstemp's 0600.
+    plain = tmp_path / "plain"
+    plain.write_bytes(b"")
+    assert {path.stat().st_mode for path in raw_files} == {plain.stat().st_mode}
+    # Fixed-interval polling keeps no task history, so extract never opens the warehouse.
+    assert not context.warehouse_path.exists()
+
+
+def test_extract_writes_parquet_raw_zone(tmp_path, monkeypatch):
+    config = load_config(pathlib.Path("config/config.json"))
+    config.project.raw_format = "parquet"
+    config.project.raw_keep_source = False
+    monkeypatch.setenv(config.bi.username_env, "user")
+    monkeypatch.setenv(config.bi.password_env, "pass")
+    monkeypatch.setattr(runner, "GuanbiClient", FakeGuanbiClient)
+    context = RunContext.create(parse_date("2025-01-01"), tmp_path / "data", tmp_path / "logs")
+
+    result = runner.run_extract(config, context, logging.getLogger("test"))
+
+    assert all(path.name == "data.parquet" for path in result.files.values())
+    assert sorted(path.name for path in context.raw_dir.glob("chart_id=*/*")) == ["data.parquet"] * len(result.files)
+    assert all(count == 1 for count in result.row_counts.values())
+
+
+class SlowPollGuanbiClient(FakeGuanbiClient):
+    def poll_task(self, task_id, token, expected_seconds=None, on_running=None):
+        on_running()
+        time.sleep(0.2)
+        return "2025-01-01 00:00:00"
+
+
+def test_adaptive_extract_records_midpoint_of_last_poll_gap(tmp_path, monkeypatch):
+    config = load_config(pathlib.Path("config/config.json"))
+    config.project.task_poll_strategy = "adaptive"
+    monkeypatch.setenv(config.bi.username_env, "user")
+    monkeypatch.setenv(config.bi.password_env, "pass")
+    monkeypatch.setattr(runner, "GuanbiClient", SlowPollGuanbiClient)
+    context = RunContext.create(parse_date("2025-01-01"), tmp_path, tmp_path / "logs")
+
+    runner.run_extract(config, context, logging.getLogger("test"))
+
+    # The task was seen running right away and finished 0.2s later, so about 0.1s is recorded.
+    estimates = Warehouse(context.warehouse_path).get_task_duration_estimates(history_runs=5)
+    assert len(estimates) == len(config.bi.charts)
+    assert all(0.09 <= seconds < 0.15 for seconds in estimates.values())
+
+
+def test_adaptive_poll_schedule_uses_history_and_caps_interval():
+    schedule = PollSchedule(initial_seconds=0.5, backoff=2.0, max_interval_seconds=4.0, use_history=True)
+    delays = schedule.delays(expected_seconds=60)
+    assert [next(delays) for _ in range(6)] == [0.5, 53.5, 1.0, 2.0, 4.0, 4.0]
+
+
+def test_fixed_poll_schedule_matches_interval():
+    delays = PollSchedule.fixed(5).delays(expected_seconds=60)
+    assert [next(delays) for _ in range(3)] == [5, 5, 5]
+
+
+class StubGuanbiServer:
+    # In-process Guanbi API: each task stays RUNNING for a set number of polls and the
+    # export streams its body slowly in small pieces.
+    def __init__(self, running_polls, body, piece_size=64, piece_delay=0.0):
+        self.running_polls = running_polls
+        self.body = body
+        self.piece_size = piece_size
+        self.piece_delay = piece_delay
+        self.polls = {task_id: 0 for task_id in running_polls}
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def task_status(self, request):
+        task_id = request.match_info["task_id"]
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.02)
+        self.in_flight -= 1
+        self.polls[task_id] += 1
+        if self.polls[task_id] <= self.running_polls[task_id]:
+            return self.web.json_response({"status": "RUNNING"})
+        return self.web.json_response({"status": "FINISHED", "finishedTime": f"done-{task_id}"})
+
+    async def export(self, request):
+        response = self.web.StreamResponse()
+        await response.prepare(request)
+        for start in range(0, len(self.body), self.piece_size):
+            await asyncio.sleep(self.piece_delay)
+            await response.write(self.body[start:start + self.piece_size])
+        await response.write_eof()
+        return response
+
+    async def start(self):
+        from aiohttp import web
+
+        self.web = web
+        app = self.web.Application()
+        app.router.add_get("/api/task/{task_id}", self.task_status)
+        app.router.add_post("/api/export/file/csv/{file_name}", self.export)
+        self.runner = self.web.AppRunner(app)
+        await self.runner.setup()
+        site = self.web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        return f"http://127.0.0.1:{self.runner.addresses[0][1]}"
+
+
+def _async_client(base_url, timeout_seconds=10):
+    config = load_config(pathlib.Path("config/config.json"))
+    return AsyncGuanbiClient(
+        config=config.bi.model_copy(update={"base_url": base_url}),
+        username="user",
+        password="pass",
+        timeout_seconds=timeout_seconds,
+        max_retries=0,
+        poll_interval_seconds=1,
+        max_wait_seconds=30,
+        logger=logging.getLogger("test"),
+        poll_schedule=PollSchedule.fixed(0.05),
+    )
+
+
+def test_async_client_polls_pending_tasks_together():
+    pytest.importorskip("aiohttp")
+    server = StubGuanbiServer({"t1": 1, "t2": 3, "t3": 5}, body=b"")
+    running = []
+
+    async def run():
+        base_url = await server.start()
+        try:
+            async with _async_client(base_url) as client:
+                polls = [
+                    client.poll_task(task_id, "tok", on_running=functools.partial(running.append, task_id))
+                    for task_id in server.polls
+                ]
+                return await asyncio.gather(*polls)
+        finally:
+            await server.runner.cleanup()
+
+    assert asyncio.run(run()) == ["done-t1", "done-t2", "done-t3"]
+    assert server.polls == {"t1": 2, "t2": 4, "t3": 6}
+    assert sorted(running) == ["t1"] + ["t2"] * 3 + ["t3"] * 5
+    assert server.max_in_flight == 3
+
+
+def test_async_client_streams_download_in_chunks_past_timeout():
+    pytest.importorskip("aiohttp")
+    body = b"".join(f"{index},{'x' * 20}\n".encode() for index in range(400))
+    # Twenty pieces 0.1s apart take about 2s, longer than timeout_seconds.
+    server = StubGuanbiServer({}, body=body, piece_size=len(body) // 20 + 1, piece_delay=0.1)
+    chunks = []
+
+    async def run():
+        base_url = await server.start()
+        try:
+            async with _async_client(base_url, timeout_seconds=1) as client:
+                await client.download_to(chunks.append, "tok", "file", "done", "simple", "csv", chunk_size=256)
+        finally:
+            await server.runner.cleanup()
+
+    asyncio.run(run())
+    assert b"".join(chunks) == body
+    assert len(chunks) > 20
+    assert all(len(chunk) <= 256 for chunk in chunks)
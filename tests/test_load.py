@@ -0,0 +1,114 @@
+import logging
+import pathlib
+
+import duckdb
+import openpyxl
+import pytest
+
+from src.config import load_config
+from src.core import RunContext
+from src.storage import Warehouse, resolve_raw_path, run_load
+from src.storage import warehouse as warehouse_module
+from src.storage.warehouse import ExcelReaderUnavailable
+from src.utils.dates import parse_date
+
+
+def _write_raw(context, chart, text, name="data.csv"):
+    chart_dir = context.raw_dir / f"chart_id={chart.chart_id}"
+    chart_dir.mkdir(parents=True, exist_ok=True)
+    (chart_dir / name).write_text(text, encoding="utf-8")
+    return chart_dir
+
+
+def _write_xlsx(path, rows, sheet_name=None):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    if sheet_name:
+        sheet.title = sheet_name
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+
+
+def test_parallel_load_commits_all_charts_or_none(tmp_path):
+    config = load_config(pathlib.Path("config/config.json"))
+    config.project.load_concurrency = 4
+    config.targets.tables = []
+    context = RunContext.create(parse_date("2025-01-01"), tmp_path, tmp_path)
+    logger = logging.getLogger("test")
+
+    for chart in config.bi.charts:
+        _write_raw(context, chart, "a,b\n1,x\n2,y\n")
+    result = run_load(config, context, logger)
+    assert set(result.raw_rows.values()) == {2}
+
+    first, *rest = config.bi.charts
+    _write_raw(context, first, "a,b\n1,x\n2,y\n3,z\n")
+    (context.raw_dir / f"chart_id={rest[-1].chart_id}" / "data.csv").unlink()
+    with pytest.raises(FileNotFoundError):
+        run_load(config, context, logger)
+
+    with duckdb.connect(str(context.warehouse_path)) as con:
+        rows = con.execute(f"SELECT COUNT(*) FROM raw.chart_{first.chart_id}").fetchone()[0]
+    assert rows == 2
+
+
+def test_unchanged_target_skips_reload(tmp_path):
+    config = load_config(pathlib.Path("config/config.json"))
+    context = RunContext.create(parse_date("2025-01-01"), tmp_path, tmp_path)
+    target_path = tmp_path / "targets.csv"
+    target_path.write_text("a,b\n1,x\n2,y\n", encoding="utf-8")
+    target = config.targets.tables[0].model_copy(update={"path": str(target_path), "schema_path": None})
+
+    warehouse = Warehouse(context.warehouse_path)
+    warehouse.init()
+    assert warehouse.get_unchanged_target_rows(target, target_path) is None
+    assert warehouse.load_target_table(target) == 2
+    assert warehouse.get_unchanged_target_rows(target, target_path) == 2
+
+    target_path.write_text("a,b\n1,x\n2,z\n", encoding="utf-8")
+    assert warehouse.get_unchanged_target_rows(target, target_path) is None
+
+
+def test_resolve_raw_path_prefers_xlsx_for_direct_loads(tmp_path):
+    config = load_config(pathlib.Path("config/config.json"))
+    context = RunContext.create(parse_date("2025-01-01"), tmp_path, tmp_path)
+    chart = config.bi.charts[0]
+    chart_dir = _write_raw(context, chart, "a\n1\n")
+    _write_xlsx(chart_dir / "data.xlsx", [["a"], [1]])
+
+    assert resolve_raw_path(context, chart) == chart_dir / "data.csv"
+    assert resolve_raw_path(context, chart, prefer_xlsx=True) == chart_dir / "data.xlsx"
+
+    (chart_dir / "data.xlsx").unlink()
+    assert resolve_raw_path(context, chart, prefer_xlsx=True) == chart_dir / "data.csv"
+
+    _write_raw(context, chart, "", name="data.parquet")
+    assert resolve_raw_path(context, chart, prefer_xlsx=True) == chart_dir / "data.parquet"
+
+
+def test_direct_xlsx_load_falls_back_to_csv_without_excel_extension(tmp_path, monkeypatch, caplog):
+    config = load_config(pathlib.Path("config/config.json"))
+    config.project.xlsx_load = "direct"
+    config.targets.tables = []
+    context = RunContext.create(parse_date("2025-01-01"), tmp_path, tmp_path)
+
+    def unavailable(con):
+        raise ExcelReaderUnavailable("DuckDB excel extension is unavailable: offline")
+
+    monkeypatch.setattr(warehouse_module, "load_excel_extension", unavailable)
+    chart_dirs = []
+    for chart in config.bi.charts:
+        chart_dir = context.raw_dir / f"chart_id={chart.chart_id}"
+        chart_dir.mkdir(parents=True)
+        _write_xlsx(chart_dir / "data.xlsx", [["a", "b"], [1, "x"], [2, "y"]], chart.sheet_name)
+        chart_dirs.append(chart_dir)
+
+    with caplog.at_level(logging.WARNING):
+        result = run_load(config, context, logging.getLogger("test"))
+
+    assert set(result.raw_rows.values()) == {2}
+    assert all((chart_dir / "data.csv").exists() for chart_dir in chart_dirs)
+    warnings = [record.getMessage() for record in caplog.records if record.levelno == logging.WARNING]
+    assert len(warnings) == len(config.bi.charts)
+    assert all("Direct XLSX load failed" in message for message in warnings)
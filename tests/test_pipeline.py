@@ -0,0 +1,60 @@
+import json
+import logging
+import pathlib
+from types import SimpleNamespace
+
+import duckdb
+import pytest
+
+from src import pipeline
+from src.config import load_config
+from src.core import RunContext
+from src.utils.dates import parse_date
+
+
+def _stage(name, fail=False):
+    # Every stage takes the warehouse as its fourth positional argument.
+    def run(*args, **kwargs):
+        with args[3].connect() as con:
+            con.execute(f"CREATE TABLE {name} AS SELECT 1 AS id")
+        if fail:
+            raise RuntimeError(f"{name} failed")
+        return SimpleNamespace(
+            row_counts={},
+            raw_rows={},
+            target_rows={},
+            table_rows={},
+            cached=[],
+            sheet_rows={},
+            written_rows={},
+            requests={},
+        )
+
+    return run
+
+
+def _run_history(context):
+    with duckdb.connect(str(context.warehouse_path)) as con:
+        status, metrics = con.execute("SELECT status, metrics FROM ops.run_history").fetchone()
+    return status, json.loads(metrics)
+
+
+@pytest.mark.parametrize("fail", [False, True])
+def test_pipeline_records_warehouse_stats_after_checkpoint(tmp_path, monkeypatch, fail):
+    config = load_config(pathlib.Path("config/config.json"))
+    config.feishu.alert = None
+    context = RunContext.create(parse_date("2025-01-01"), tmp_path, tmp_path / "logs")
+    monkeypatch.setattr(pipeline, "run_extract", _stage("extracted"))
+    monkeypatch.setattr(pipeline, "run_load", _stage("loaded"))
+    monkeypatch.setattr(pipeline, "run_transform", _stage("transformed"))
+    monkeypatch.setattr(pipeline, "run_publish", _stage("published", fail=fail))
+
+    if fail:
+        with pytest.raises(RuntimeError):
+            pipeline.run_pipeline(config, context, logging.getLogger("test"))
+    else:
+        pipeline.run_pipeline(config, context, logging.getLogger("test"))
+
+    status, metrics = _run_history(context)
+    assert status == ("failed" if fail else "success")
+    assert metrics["warehouse"] == {"opens": 1, "checkpoints": 1}
@@ -0,0 +1,83 @@
+import json
+import pathlib
+
+import pytest
+
+from src.config import load_config
+from src.config.model import ChartConfig, ProfileDriftConfig
+from src.core import RunContext
+from src.storage import Warehouse, profile_raw_files
+from src.utils.dates import parse_date
+
+
+def _write_chart(context, chart_id, text):
+    chart_dir = context.raw_dir / f"chart_id={chart_id}"
+    chart_dir.mkdir(parents=True, exist_ok=True)
+    (chart_dir / "data.csv").write_text(text, encoding="utf-8")
+    return ChartConfig(chart_id=chart_id, name=chart_id)
+
+
+def test_profile_collects_column_statistics(tmp_path):
+    context = RunContext.create(parse_date("2025-01-01"), tmp_path, tmp_path)
+    charts = [
+        _write_chart(context, "c1", "amount,region\n1,east\n3,east\n,west\n"),
+        ChartConfig(chart_id="missing", name="missing"),
+    ]
+    report = json.loads(profile_raw_files(context, charts, sample_rows=0, concurrency=2).read_text(encoding="utf-8"))
+
+    first, missing = report["charts"]
+    assert missing == {"chart_id": "missing", "chart_name": "missing", "file_path": missing["file_path"], "exists": False}
+    assert first["row_count"] == 3
+    amount, region = first["columns"]
+    assert (amount["sample_nulls"], amount["sample_distinct"], amount["mean"]) == (1, 2, 2.0)
+    assert (amount["min"], amount["max"]) == ("1", "3")
+    assert region["top_values"][0] == "east"
+    assert region["distinct_approx"] is False
+
+
+def test_profile_uses_approx_distinct_for_default_sample(tmp_path):
+    project = load_config(pathlib.Path("config/config.json")).project
+    context = RunContext.create(parse_date("2025-01-01"), tmp_path, tmp_path)
+    rows = project.profile_approx_distinct_rows * 2
+    chart = _write_chart(context, "c1", "id\n" + "".join(f"{i}\n" for i in range(rows)))
+    report_path = profile_raw_files(
+        context, [chart], project.profile_sample_rows, approx_threshold=project.profile_approx_distinct_rows
+    )
+
+    (column,) = json.loads(report_path.read_text(encoding="utf-8"))["charts"][0]["columns"]
+    assert column["distinct_approx"] is True
+    assert column["sample_distinct"] == pytest.approx(rows, rel=0.1)
+
+
+def test_profile_history_flags_drift(tmp_path):
+    drift = ProfileDriftConfig(window_days=3)
+    warehouse = Warehouse(tmp_path / "warehouse.duckdb")
+    for day, rows in ((1, 4), (2, 4), (3, 4), (4, 12)):
+        context = RunContext.create(parse_date(f"2025-01-0{day}"), tmp_path, tmp_path)
+        body = "".join(f"{i},east\n" for i in range(rows))
+        chart = _write_chart(context, "c1", "amount,region\n" + body)
+        report_path = profile_raw_files(context, [chart], sample_rows=0, warehouse=warehouse, drift=drift)
+
+    report = json.loads(report_path.read_text(encoding="utf-8"))
+    flagged = {(item["metric"], item["column_name"]) for item in report["drift"]}
+    assert flagged == {("row_count", None), ("distinct_count", "amount")}
+    with warehouse.connect() as con:
+        assert con.execute("SELECT COUNT(*) FROM ops.column_profile").fetchone()[0] == 8
+
+
+def test_row_count_drift_is_reported_once_per_chart(tmp_path):
+    drift = ProfileDriftConfig(window_days=3)
+    warehouse = Warehouse(tmp_path / "warehouse.duckdb")
+    # The region column only appears on day 3, so its history covers one day.
+    for day, rows, header in ((1, 4, "amount"), (2, 4, "amount"), (3, 5, "amount,region"), (4, 40, "amount,region")):
+        context = RunContext.create(parse_date(f"2025-01-0{day}"), tmp_path, tmp_path)
+        suffix = ",east" if "region" in header else ""
+        body = "".join(f"{i % 4}{suffix}\n" for i in range(rows))
+        report_path = profile_raw_files(
+            context, [_write_chart(context, "c1", f"{header}\n{body}")], sample_rows=0, warehouse=warehouse, drift=drift
+        )
+
+    report = json.loads(report_path.read_text(encoding="utf-8"))
+    (row_drift,) = [item for item in report["drift"] if item["metric"] == "row_count"]
+    assert (row_drift["current_value"], row_drift["days"]) == (40, 3)
+    assert row_drift["baseline_value"] == pytest.approx(13 / 3)
@@ -0,0 +1,314 @@
+import json
+import logging
+import pathlib
+import time
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+import duckdb
+
+from src.config import load_config
+from src.config.model import OutputSheetConfig
+from src.core import RunContext
+from src.publish import runner
+from src.publish.feishu import FeishuPayloadTooLarge, JsonStream, serialize_value
+from src.publish.runner import _changed_runs, _row_json_sql
+from src.publish.sizing import BatchSizer
+from src.storage import Warehouse
+from src.utils.dates import parse_date
+
+
+def _runs(con, previous, batch_size=10):
+    cursor = con.execute("SELECT hash(*COLUMNS(*)), json_array(*COLUMNS(*))::VARCHAR FROM t")
+    hashes = []
+    runs = list(_changed_runs(cursor, batch_size, previous, hashes))
+    return runs, hashes
+
+
+def test_changed_runs_only_yields_modified_ranges():
+    con = duckdb.connect()
+    con.execute("CREATE TABLE t AS SELECT range AS id, range * 10 AS amt FROM range(8)")
+    runs, snapshot = _runs(con, None, batch_size=3)
+    assert [(start, len(rows)) for start, rows in runs] == [(0, 3), (3, 3), (6, 2)]
+
+    con.execute("UPDATE t SET amt = -1 WHERE id IN (2, 3, 6)")
+    con.execute("INSERT INTO t VALUES (8, 80)")
+    runs, hashes = _runs(con, snapshot)
+    assert runs == [(2, ["[2,-1]", "[3,-1]"]), (6, ["[6,-1]"]), (8, ["[8,80]"])]
+    assert len(hashes) == 9
+
+    runs, _ = _runs(con, hashes)
+    assert runs == []
+
+
+def test_row_json_sql_formats_cells_like_serialize_value():
+    con = duckdb.connect()
+    con.execute(
+        """
+        CREATE TABLE t AS SELECT
+            DATE '2025-01-02' AS d,
+            TIMESTAMP '2025-01-02 03:04:05.678' AS ts,
+            12.50::DECIMAL(10, 2) AS amount,
+            'nan'::DOUBLE AS ratio,
+            NULL::INTEGER AS missing,
+            '省区"A"' AS name
+        """
+    )
+    column_types = [(row[0], row[1]) for row in con.execute("DESCRIBE t").fetchall()]
+    (row,) = con.execute(f"SELECT {_row_json_sql(column_types)} FROM t").fetchone()
+    assert json.loads(row) == ["2025-01-02", "2025-01-02 03:04:05", 12.5, None, None, '省区"A"']
+
+    # TIMESTAMPTZ cells are rendered in the session time zone, offset included.
+    instant = datetime(2025, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+    for zone in ("Asia/Shanghai", "UTC", "Asia/Kolkata", "America/St_Johns"):
+        con.execute(f"SET TimeZone = '{zone}'")
+        (cell,) = con.execute(
+            f"SELECT {_row_json_sql([('ts', 'TIMESTAMP WITH TIME ZONE')])} FROM (SELECT TIMESTAMPTZ '2025-01-02 03:04:05.678+00' AS ts)"
+        ).fetchone()
+        assert json.loads(cell) == [serialize_value(instant.astimezone(ZoneInfo(zone)))]
+
+
+class FakeFeishuClient:
+    writes = []
+
+    def __init__(self, **kwargs):
+        pass
+
+    def list_sheets(self, spreadsheet_token):
+        return [{"title": output.sheet_name, "sheet_id": output.sheet_name} for output in self.outputs]
+
+    def write_values(self, spreadsheet_token, range_str, values):
+        time.sleep(0.01 if values[0][0] == "" else 0.02)
+        self.writes.append((range_str, values[0][0]))
+
+    def write_values_batch(self, spreadsheet_token, value_ranges):
+        body = JsonStream(b"[", value_ranges, b"]", chunk_bytes=16)
+        payload = b"".join(body)
+        assert len(payload) == len(body)
+        for value_range in json.loads(payload):
+            self.write_values(spreadsheet_token, value_range["range"], value_range["values"])
+
+
+def test_concurrent_publish_orders_header_and_tail(tmp_path, monkeypatch):
+    config = load_config(pathlib.Path("config/config.json"))
+    config.project.publish_concurrency = 4
+    for output in config.feishu.outputs:
+        output.batch_size = 2
+    FakeFeishuClient.outputs = config.feishu.outputs
+    FakeFeishuClient.writes = []
+    monkeypatch.setenv(config.feishu.app_id_env, "id")
+    monkeypatch.setenv(config.feishu.app_secret_env, "secret")
+    monkeypatch.setattr(runner, "FeishuClient", FakeFeishuClient)
+    context = RunContext.create(parse_date("2025-01-01"), tmp_path / "data", tmp_path / "logs")
+    warehouse = Warehouse(tmp_path / "warehouse.duckdb")
+    warehouse.init()
+    with warehouse.connect() as con:
+        for output in config.feishu.outputs:
+            con.execute(f"CREATE TABLE {output.table} AS SELECT range AS id FROM range(1, 9)")
+            warehouse.record_publish("previous", "2024-12-31", output.sheet_name, 20, 1)
+
+    result = runner.run_publish(config, context, logging.getLogger("test"), warehouse)
+
+    assert result.sheet_rows == {output.sheet_name: 9 for output in config.feishu.outputs}
+    # Header, packed data ranges, packed tail ranges.
+    assert result.requests == {output.sheet_name: 3 for output in config.feishu.outputs}
+    for output in config.feishu.outputs:
+        writes = [value for range_str, value in FakeFeishuClient.writes if range_str.startswith(f"{output.sheet_name}!")]
+        assert writes[0] == "id"
+        assert sorted(writes[1:5]) == [1, 3, 5, 7]
+        assert writes[5:] == ["", "", "", "", "", ""]
+
+
+class SizeLimitedClient:
+    def __init__(self, limit_bytes):
+        self.limit_bytes = limit_bytes
+        self.rows = {}
+        self.rejected = 0
+
+    def write_values_batch(self, spreadsheet_token, value_ranges):
+        body = JsonStream(b"[", value_ranges, b"]")
+        if len(body) > self.limit_bytes:
+            self.rejected += 1
+            raise FeishuPayloadTooLarge("request too large")
+        for value_range in json.loads(b"".join(body)):
+            first_row = int(value_range["range"].split("!A")[1].split(":")[0])
+            for offset, row in enumerate(value_range["values"]):
+                self.rows[first_row + offset] = row
+
+    def last_request_seconds(self):
+        return 0.01
+
+
+def test_auto_sizing_splits_rejected_requests():
+    client = SizeLimitedClient(limit_bytes=200 * 1024)
+    sizer = BatchSizer(target_bytes=1024 * 1024, max_bytes=1024 * 1024, target_seconds=10)
+    writer = runner._RangeWriter(client, "token", runner._Writes(), sizer=sizer)
+    rows = [json.dumps([index, "x" * 40]).encode() for index in range(20000)]
+    writer.write("sheet", 2, 1, rows, 2)
+    writer.join()
+
+    assert sorted(client.rows) == list(range(2, 20002))
+    assert client.rows[20001] == [19999, "x" * 40]
+    assert client.rejected >= 1
+    assert 64 * 1024 <= sizer.target_bytes <= 200 * 1024
+
+
+class DeletingClient:
+    def __init__(self, fail_below=None):
+        self.deleted = []
+        self.fail_below = fail_below
+
+    def delete_rows(self, spreadsheet_token, sheet_id, start_index, end_index):
+        if self.fail_below is not None and start_index < self.fail_below:
+            raise RuntimeError("Failed to delete rows")
+        self.deleted.append((start_index, end_index))
+
+
+def test_delete_tail_deletes_bottom_up_and_reports_leftover_rows():
+    client = DeletingClient()
+    assert runner._delete_tail(client, "token", "sheet", 11, 12000, logging.getLogger("test")) == (3, 0)
+    assert client.deleted == [(7011, 12010), (2011, 7010), (11, 2010)]
+
+    client = DeletingClient(fail_below=5000)
+    assert runner._delete_tail(client, "token", "sheet", 11, 12000, logging.getLogger("test")) == (2, 7000)
+    assert client.deleted == [(7011, 12010)]
+
+
+class GridFeishuClient:
+    # Keeps the written cells of one sheet so tests can check what the sheet ends up showing.
+    def __init__(self, fail_deletes=False, **kwargs):
+        self.cells = {}
+        self.ranges = []
+        self.deleted = []
+        self.fail_deletes = fail_deletes
+
+    def list_sheets(self, spreadsheet_token):
+        return [{"title": "Sheet", "sheet_id": "S"}]
+
+    def write_values_batch(self, spreadsheet_token, value_ranges):
+        for value_range in json.loads(b"".join(JsonStream(b"[", value_ranges, b"]"))):
+            self.ranges.append(value_range["range"])
+            start_col, start_row = runner.parse_cell(value_range["range"].split("!")[1].split(":")[0])
+            for row_offset, row in enumerate(value_range["values"]):
+                for col_offset, value in enumerate(row):
+                    self.cells[(start_row + row_offset, start_col + col_offset)] = value
+
+    def delete_rows(self, spreadsheet_token, sheet_id, start_index, end_index):
+        if self.fail_deletes:
+            raise RuntimeError("Failed to delete rows")
+        self.deleted.append((start_index, end_index))
+        count = end_index - start_index + 1
+        self.cells = {
+            (row - count if row > end_index else row, col): value
+            for (row, col), value in self.cells.items()
+            if not start_index <= row <= end_index
+        }
+
+    def column(self, col=1):
+        last_row = max((row for row, column in self.cells if column == col), default=0)
+        values = [self.cells.get((row, col), "") for row in range(1, last_row + 1)]
+        while values and values[-1] == "":
+            values.pop()
+        return values
+
+
+def _publish_setup(tmp_path, monkeypatch, client, **output):
+    config = load_config(pathlib.Path("config/config.json"))
+    config.feishu.outputs = [OutputSheetConfig(sheet_name="Sheet", table="mart.published", **output)]
+    monkeypatch.setenv(config.feishu.app_id_env, "id")
+    monkeypatch.setenv(config.feishu.app_secret_env, "secret")
+    monkeypatch.setattr(runner, "FeishuClient", lambda **kwargs: client)
+    context = RunContext.create(parse_date("2025-01-01"), tmp_path / "data", tmp_path / "logs")
+    warehouse = Warehouse(tmp_path / "warehouse.duckdb")
+    warehouse.init()
+    return config, context, warehouse
+
+
+def test_delta_publish_rewrites_changed_rows_and_follows_layout(tmp_path, monkeypatch):
+    client = GridFeishuClient()
+    config, context, warehouse = _publish_setup(tmp_path, monkeypatch, client, publish_mode="delta")
+    with warehouse.connect() as con:
+        con.execute("CREATE TABLE mart.published AS SELECT range AS id FROM range(1, 5)")
+    logger = logging.getLogger("test")
+
+    runner.run_publish(config, context, logger, warehouse)
+    assert client.column() == ["id", 1, 2, 3, 4]
+
+    with warehouse.connect() as con:
+        con.execute("UPDATE mart.published SET id = 30 WHERE id = 3")
+    client.ranges = []
+    result = runner.run_publish(config, context, logger, warehouse)
+    assert client.ranges == ["S!A4:A4"]
+    assert result.written_rows == {"Sheet": 1}
+    assert client.column() == ["id", 1, 2, 30, 4]
+
+    # Dropping the header moves every data row up, so the snapshot no longer applies.
+    config.feishu.outputs[0].include_header = False
+    runner.run_publish(config, context, logger, warehouse)
+    assert client.column() == [1, 2, 30, 4]
+
+
+def test_full_publish_keeps_no_snapshot_and_invalidates_a_delta_one(tmp_path, monkeypatch):
+    client = GridFeishuClient()
+    config, context, warehouse = _publish_setup(tmp_path, monkeypatch, client)
+    output = config.feishu.outputs[0]
+    with warehouse.connect() as con:
+        con.execute("CREATE TABLE mart.published AS SELECT range AS id FROM range(1, 5)")
+    logger = logging.getLogger("test")
+
+    runner.run_publish(config, context, logger, warehouse)
+    assert warehouse.get_publish_snapshot("Sheet") is None
+
+    output.publish_mode = "delta"
+    runner.run_publish(config, context, logger, warehouse)
+    output.publish_mode = "full"
+    with warehouse.connect() as con:
+        con.execute("UPDATE mart.published SET id = 20 WHERE id = 2")
+    runner.run_publish(config, context, logger, warehouse)
+    assert warehouse.get_publish_snapshot("Sheet")[2] == []
+
+    # Back in delta mode the sheet (written by the full publish) is rewritten in full.
+    output.publish_mode = "delta"
+    with warehouse.connect() as con:
+        con.execute("UPDATE mart.published SET id = 2 WHERE id = 20")
+    client.ranges = []
+    result = runner.run_publish(config, context, logger, warehouse)
+    assert result.written_rows == {"Sheet": 5}
+    assert client.column() == ["id", 1, 2, 3, 4]
+
+
+def _shrink_published(tmp_path, monkeypatch, client, **output):
+    config, context, warehouse = _publish_setup(tmp_path, monkeypatch, client, **output)
+    logger = logging.getLogger("test")
+    with warehouse.connect() as con:
+        con.execute("CREATE TABLE mart.published AS SELECT range AS id FROM range(1, 9)")
+    runner.run_publish(config, context, logger, warehouse)
+    with warehouse.connect() as con:
+        con.execute("DELETE FROM mart.published WHERE id > 3")
+    client.ranges = []
+    return runner.run_publish(config, context, logger, warehouse)
+
+
+def test_publish_deletes_tail_rows_of_full_width_outputs(tmp_path, monkeypatch):
+    client = GridFeishuClient()
+    result = _shrink_published(tmp_path, monkeypatch, client, clear_method="delete_rows", owns_full_rows=True)
+    assert client.deleted == [(5, 9)]
+    assert client.ranges == ["S!A1:A1", "S!A2:A4"]
+    # One packed write request and one delete.
+    assert result.requests == {"Sheet": 2}
+    assert client.column() == ["id", 1, 2, 3]
+
+
+def test_publish_clears_tail_with_blanks_when_rows_cannot_be_deleted(tmp_path, monkeypatch):
+    client = GridFeishuClient(fail_deletes=True)
+    _shrink_published(tmp_path, monkeypatch, client, clear_method="delete_rows", owns_full_rows=True)
+    assert client.ranges[-1] == "S!A5:A9"
+    assert client.column() == ["id", 1, 2, 3]
+
+    # Without owns_full_rows the rows are never deleted, since that would take neighbouring cells with them.
+    client = GridFeishuClient()
+    (tmp_path / "shared").mkdir()
+    _shrink_published(tmp_path / "shared", monkeypatch, client, clear_method="delete_rows")
+    assert client.deleted == []
+    assert client.ranges[-1] == "S!A5:A9"
+    assert client.column() == ["id", 1, 2, 3]
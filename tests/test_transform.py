@@ -1,7 +1,160 @@
+import logging
+import threading
+import time
+
+import pytest
+
+from src.config.model import ChartConfig
+from src.core import RunContext
+from src.storage import Warehouse
+from src.transform import run_transform
+from src.transform.dag import build_models, run_models
 from src.transform.runner import render_sql
+from src.utils.dates import parse_date
+
+
+@pytest.fixture
+def context(tmp_path):
+    return RunContext.create(parse_date("2025-01-01"), tmp_path, tmp_path)
+
+
+@pytest.fixture
+def warehouse(context):
+    return Warehouse(context.warehouse_path)
 
 
 def test_render_sql():
     sql = "SELECT '{{ run_date }}' AS dt"
     rendered = render_sql(sql, "2025-01-01")
-    assert "2025-01-01" in rendered
\ No newline at end of file
+    assert "2025-01-01" in rendered
+
+
+def test_transform_reuses_warehouse_session(tmp_path, context, warehouse):
+    sql_dir = tmp_path / "sql"
+    sql_dir.mkdir()
+    (sql_dir / "daily.sql").write_text(
+        "CREATE OR REPLACE TABLE mart.daily AS SELECT DATE '{{ run_date }}' AS run_date",
+        encoding="utf-8",
+    )
+
+    with warehouse.session():
+        warehouse.init()
+        result = run_transform(context, sql_dir, logging.getLogger("test"), warehouse)
+        warehouse.record_run_start(context.run_id, "2025-01-01")
+
+    assert result.table_rows == {"mart.daily": 1}
+    assert warehouse.stats() == {"opens": 1, "checkpoints": 1}
+
+
+def _write_models(sql_dir, models):
+    sql_dir.mkdir()
+    for name, sql in models.items():
+        (sql_dir / f"{name}.sql").write_text(sql, encoding="utf-8")
+    return sorted(sql_dir.glob("*.sql"))
+
+
+def test_build_models_parses_dependencies(tmp_path):
+    files = _write_models(
+        tmp_path / "sql",
+        {
+            "a": "CREATE OR REPLACE TABLE mart.a AS SELECT * FROM raw.chart_x JOIN dim.targets_a USING (id)",
+            "b": "-- reads mart.c in a comment only\nCREATE OR REPLACE TABLE mart.b AS SELECT * FROM MART.A",
+            "c": "CREATE OR REPLACE TABLE mart.c AS SELECT 'mart.b' AS label FROM mart.external",
+        },
+    )
+    models = {model.name: model for model in build_models(files)}
+    assert models["mart.a"].refs == {"mart.a", "raw.chart_x", "dim.targets_a"}
+    assert models["mart.a"].depends_on == set()
+    assert models["mart.b"].depends_on == {"mart.a"}
+    assert models["mart.c"].depends_on == set()
+
+
+def test_build_models_rejects_cycles(tmp_path):
+    files = _write_models(
+        tmp_path / "sql",
+        {
+            "a": "CREATE OR REPLACE TABLE mart.a AS SELECT * FROM mart.b",
+            "b": "CREATE OR REPLACE TABLE mart.b AS SELECT * FROM mart.a",
+        },
+    )
+    with pytest.raises(ValueError, match="cycle"):
+        build_models(files)
+
+
+def test_run_models_waits_for_dependencies(tmp_path):
+    files = _write_models(
+        tmp_path / "sql",
+        {
+            "a": "SELECT 1 FROM raw.x",
+            "b": "SELECT 1 FROM raw.y",
+            "c": "SELECT 1 FROM mart.a JOIN mart.b ON true",
+        },
+    )
+    finished = []
+    lock = threading.Lock()
+
+    def run(model):
+        time.sleep(0.02 if model.name == "mart.a" else 0.0)
+        with lock:
+            finished.append(model.name)
+        return model.name
+
+    results = run_models(build_models(files), run, max_workers=3)
+    assert list(results) == ["mart.a", "mart.b", "mart.c"]
+    assert finished[-1] == "mart.c"
+
+
+def test_incremental_model_replaces_only_run_date_partition(tmp_path, warehouse):
+    sql_dir = tmp_path / "sql"
+    _write_models(
+        sql_dir,
+        {
+            "daily": "-- materialized: incremental\n"
+            "SELECT DATE '{{ run_date }}' AS run_date, i FROM range(3) t(i);",
+            "daily_view": "-- materialized: view\nSELECT run_date, COUNT(*) AS n FROM mart.daily GROUP BY run_date",
+        },
+    )
+    logger = logging.getLogger("test")
+    for run_date in ("2025-01-01", "2025-01-02", "2025-01-02"):
+        context = RunContext.create(parse_date(run_date), tmp_path, tmp_path)
+        result = run_transform(context, sql_dir, logger)
+
+    assert result.table_rows == {"mart.daily": 3, "mart.daily_view": 2}
+    with warehouse.connect() as con:
+        assert con.execute("SELECT COUNT(*) FROM mart.daily").fetchone()[0] == 6
+
+
+def test_transform_cache_skips_models_with_unchanged_inputs(tmp_path, context, warehouse):
+    chart = ChartConfig(chart_id="c1", name="c1")
+    raw_csv = tmp_path / "data.csv"
+    sql_dir = tmp_path / "sql"
+    _write_models(
+        sql_dir,
+        {
+            "base": "-- materialized: table\nSELECT * FROM raw.chart_c1 WHERE run_date = DATE '{{ run_date }}'",
+            "top": "-- materialized: table\nSELECT COUNT(*) AS n FROM mart.base",
+        },
+    )
+    warehouse.init()
+    logger = logging.getLogger("test")
+
+    def load_and_transform(text):
+        raw_csv.write_text(text, encoding="utf-8")
+        warehouse.load_raw_file(chart, "2025-01-01", raw_csv)
+        return run_transform(context, sql_dir, logger, warehouse, use_cache=True)
+
+    assert load_and_transform("a\n1\n2\n").cached == []
+    reloaded = load_and_transform("a\n1\n2\n")
+    assert reloaded.cached == ["mart.base", "mart.top"]
+    assert reloaded.table_rows == {"mart.base": 2, "mart.top": 1}
+    assert load_and_transform("a\n1\n3\n").cached == []
+
+
+def test_transform_profile_is_recorded(tmp_path, context, warehouse):
+    sql_dir = tmp_path / "sql"
+    _write_models(sql_dir, {"daily": "-- materialized: table\nSELECT i % 3 AS g, COUNT(*) AS n FROM range(1000) t(i) GROUP BY g"})
+    run_transform(context, sql_dir, logging.getLogger("test"), warehouse, profile=True)
+
+    models, operators = warehouse.get_transform_stats(runs=5, limit=5)
+    assert [row[0] for row in models] == ["mart.daily"]
+    assert any(row[1] == "CREATE_TABLE_AS" for row in operators)